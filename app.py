@@ -1,33 +1,1475 @@
 import os
+import atexit
+import json
+import io
+import asyncio
+import contextvars
 import docker
+import requests
 import time
 import secrets
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify
+import hashlib
+import hmac
+import re
+import threading
+import fcntl
+import queue
+import random
+import sys
+from array import array
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from bisect import bisect_left
+from urllib.parse import urlsplit, urlencode, quote
+from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, Response, g
+from flask import before_render_template, template_rendered, stream_template, get_flashed_messages
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, SubmitField, PasswordField, SelectMultipleField, IntegerField, widgets
-from wtforms.validators import DataRequired
+from wtforms import StringField, SubmitField, PasswordField, SelectField, SelectMultipleField, IntegerField, FloatField, widgets
+from wtforms.validators import DataRequired, NumberRange, Optional
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 # Absoluter Pfad: Da der WORKDIR in der Dockerfile /app ist, wird die DB unter /app/data/docker_controller.db angelegt
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:////app/data/docker_controller.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:////app/data/docker_controller.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Persistente Daten (Datenbank & Icons) werden im Ordner "data" abgelegt
-app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'data', 'icons')
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(app.root_path, 'data'))
+app.config['UPLOAD_FOLDER'] = os.path.join(DATA_DIR, 'icons')
 
 db = SQLAlchemy(app)
-client = docker.from_env()
 
-# Route, um Dateien aus dem data-Ordner (z.B. Icons) bereitzustellen
+# ---------------------------
+# Metrics (Prometheus text format)
+# ---------------------------
+# Schlanke Zähler/Histogramme ohne externe Abhängigkeit. Kinder pro Label-Kombination
+# werden einmal angelegt; observe() zählt nur in vorab angelegte Bucket-Listen.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # optional: Bearer-Token für /metrics
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # letzter Eintrag: +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+class Metric:
+    def __init__(self, name, help_text, kind, labelnames=(), buckets=None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind          # "counter", "gauge" oder "histogram"
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = _HistogramChild(self.buckets) if self.kind == 'histogram' else _CounterChild()
+                    self._children[values] = child
+        return child
+
+    def _label_str(self, values, extra=None):
+        pairs = [f'{k}="{v}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, child in list(self._children.items()):
+            if self.kind == 'histogram':
+                with child.lock:
+                    counts = list(child.counts)
+                    total = child.sum
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f'{self.name}_bucket{self._label_str(values, le)} {cumulative}')
+                cumulative += counts[-1]
+                le = 'le="+Inf"'
+                lines.append(f'{self.name}_bucket{self._label_str(values, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{self._label_str(values)} {total}')
+                lines.append(f'{self.name}_count{self._label_str(values)} {cumulative}')
+            else:
+                lines.append(f'{self.name}{self._label_str(values)} {child.value}')
+        return '\n'.join(lines)
+
+METRICS = []
+
+def metric(name, help_text, kind, labelnames=(), buckets=LATENCY_BUCKETS):
+    m = Metric(name, help_text, kind, labelnames, buckets if kind == 'histogram' else None)
+    METRICS.append(m)
+    return m
+
+HTTP_REQUESTS = metric('http_requests_total', 'HTTP requests by route, method and status.', 'counter', ('route', 'method', 'status'))
+HTTP_LATENCY = metric('http_request_duration_seconds', 'HTTP request latency by route.', 'histogram', ('route',))
+HTTP_IN_FLIGHT = metric('http_requests_in_flight', 'HTTP requests currently being served.', 'gauge')
+DOCKER_CALLS = metric('docker_calls_total', 'Docker Engine API calls by operation.', 'counter', ('op',))
+DOCKER_ERRORS = metric('docker_call_errors_total', 'Docker Engine API calls answered with an error.', 'counter', ('op',))
+DOCKER_LATENCY = metric('docker_call_duration_seconds', 'Docker Engine API call latency (time to response headers).', 'histogram', ('op',))
+SQL_QUERIES = metric('sql_queries_total', 'SQL statements executed.', 'counter')
+SQL_LATENCY = metric('sql_query_duration_seconds', 'SQL statement latency.', 'histogram')
+REQUEST_SQL_QUERIES = metric('http_request_sql_queries', 'SQL statements per HTTP request by route.', 'histogram', ('route',), COUNT_BUCKETS)
+REQUEST_SQL_TIME = metric('http_request_sql_seconds', 'SQL time per HTTP request by route.', 'histogram', ('route',))
+TEMPLATE_LATENCY = metric('template_render_duration_seconds', 'Template rendering time by template.', 'histogram', ('template',))
+GROUP_ACTION_LATENCY = metric('group_action_duration_seconds', 'Duration of group start/stop orchestration.', 'histogram', ('action',))
+
+HTTP_IN_FLIGHT_ALL = HTTP_IN_FLIGHT.labels()
+SQL_QUERIES_ALL = SQL_QUERIES.labels()
+SQL_LATENCY_ALL = SQL_LATENCY.labels()
+
+# Docker-Operation aus dem Engine-API-Pfad, z.B. /v1.45/containers/<id>/start -> "start"
+DOCKER_OP_PATTERN = re.compile(r'^(?:/v[\d.]+)?/(?:containers/(?:json$|[^/]+/(json|start|stop|restart|logs|stats|kill)$)|(events|_ping|version|info)$)')
+
+def docker_operation(path):
+    match = DOCKER_OP_PATTERN.match(path)
+    if not match:
+        return 'other'
+    if match.group(2):
+        return match.group(2)
+    op = match.group(1)
+    if op is None:
+        return 'list'
+    return 'get' if op == 'json' else op
+
+def record_docker_call(method, url, status, elapsed, profile=None):
+    path = urlsplit(url).path
+    op = docker_operation(path)
+    DOCKER_CALLS.labels(op).inc()
+    DOCKER_LATENCY.labels(op).observe(elapsed)
+    if status is None or status >= 400:
+        DOCKER_ERRORS.labels(op).inc()
+    if profile is not None:
+        profile['docker'].append({'method': method, 'path': path, 'op': op,
+                                  'status': status, 'duration': elapsed})
+
+# Jede Antwort des Docker-Daemons läuft durch diesen requests-Hook
+def _record_docker_call(response, *args, **kwargs):
+    record_docker_call(response.request.method, response.request.url, response.status_code,
+                       response.elapsed.total_seconds(), getattr(_active_profile, 'report', None))
+
+def instrument_docker_client(docker_client):
+    docker_client.api.hooks['response'].append(_record_docker_call)
+
+_request_sql = threading.local()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    SQL_QUERIES_ALL.inc()
+    SQL_LATENCY_ALL.observe(elapsed)
+    if getattr(_request_sql, 'active', False):
+        _request_sql.count += 1
+        _request_sql.seconds += elapsed
+    profile = getattr(_active_profile, 'report', None)
+    if profile is not None:
+        profile['sql'].append({'statement': statement, 'parameters': repr(parameters)[:200], 'duration': elapsed})
+
+@app.before_request
+def _metrics_before_request():
+    HTTP_IN_FLIGHT_ALL.inc()
+    g.metrics_started = time.perf_counter()
+    _request_sql.active = True
+    _request_sql.count = 0
+    _request_sql.seconds = 0.0
+
+@app.after_request
+def _metrics_after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def _metrics_teardown_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    HTTP_IN_FLIGHT_ALL.dec()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = g.pop('metrics_status', 500 if exc else 200)
+    HTTP_REQUESTS.labels(route, request.method, str(status)).inc()
+    HTTP_LATENCY.labels(route).observe(time.perf_counter() - started)
+    REQUEST_SQL_QUERIES.labels(route).observe(_request_sql.count)
+    REQUEST_SQL_TIME.labels(route).observe(_request_sql.seconds)
+    _request_sql.active = False
+
+@before_render_template.connect_via(app)
+def _template_started(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _template_finished(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        TEMPLATE_LATENCY.labels(template.name or 'string').observe(time.perf_counter() - started)
+
+# ---------------------------
+# Startup & health probes
+# ---------------------------
+# Beim Import wird weder die Datenbank noch Docker angefasst: Engine, Docker-Clients und Pillow
+# entstehen erst beim ersten Gebrauch. Migrationen laufen einmal vor dem ersten Request (im
+# Gunicorn-Master vor dem Forken bzw. in prepare_app()). Schlagen sie fehl, z.B. weil das Volume
+# noch nicht bereit ist, holt ein Hintergrund-Thread sie mit Backoff nach, statt den Prozess
+# abstürzen zu lassen; Requests warten so lange kurz und erhalten sonst 503. Admin-Abgleich
+# (langsamer Passwort-Hash) und das Aufwärmen der Docker-Status-Caches laufen danach im
+# Hintergrund. /healthz meldet nur, dass der Prozess lebt, /readyz prüft Datenbank und Docker.
+STARTUP_REQUEST_WAIT = float(os.environ.get('STARTUP_REQUEST_WAIT', 5))      # Sekunden, die ein Request auf die DB wartet
+STARTUP_RETRY_DELAY = float(os.environ.get('STARTUP_RETRY_DELAY', 1))        # erste Pause zwischen Versuchen, verdoppelt sich
+STARTUP_RETRY_MAX_DELAY = float(os.environ.get('STARTUP_RETRY_MAX_DELAY', 30))
+READY_REQUIRES_DOCKER = os.environ.get('READY_REQUIRES_DOCKER', '1') == '1'  # 0: /readyz prüft nur die Datenbank
+STARTUP_LOCK_FILE = os.path.join(DATA_DIR, '.startup.lock')
+ADMIN_SEED_LOCK_FILE = os.path.join(DATA_DIR, '.admin-seed.lock')
+# Kommen ohne Datenbank aus und werden nicht aufgehalten
+STARTUP_EXEMPT_ENDPOINTS = ('healthz_view', 'readyz_view', 'metrics_view', 'static')
+
+STARTUP_SECONDS = metric('startup_seconds', 'Seconds from process start until a startup phase was reached.', 'gauge', ('phase',))
+
+# Sekunden seit dem Start des Prozesses (inklusive Interpreter und Imports; Gunicorn-Worker: seit dem fork)
+def process_uptime():
+    try:
+        with open('/proc/self/stat') as f:
+            started = int(f.read().rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime') as f:
+            return float(f.read().split()[0]) - started
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupState:
+    def __init__(self):
+        self.db_ready = threading.Event()
+        self.first_request_pending = True
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._seed_lock_fd = None
+
+    def phase(self, name):
+        uptime = process_uptime()
+        if uptime is not None:
+            STARTUP_SECONDS.labels(name).set(uptime)
+            app.logger.info("Startup phase %s reached after %.0f ms", name, uptime * 1000)
+
+    # Migrationen; mehrere Prozesse, die sie gleichzeitig nachholen, werden per Lock-Datei serialisiert
+    def init_database(self):
+        if self.db_ready.is_set():
+            return True
+        with self._lock:
+            if self.db_ready.is_set():
+                return True
+            try:
+                os.makedirs(os.path.dirname(STARTUP_LOCK_FILE), exist_ok=True)
+                fd = os.open(STARTUP_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    with app.app_context():
+                        migrate_database()
+                        db.session.remove()
+                finally:
+                    os.close(fd)
+            except (SQLAlchemyError, OSError) as e:
+                app.logger.warning("Database not ready: %s", e)
+                return False
+            self.db_ready.set()
+        self.phase('database')
+        return True
+
+    def start_background(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='startup', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        delay = STARTUP_RETRY_DELAY
+        while not self.init_database():
+            time.sleep(delay)
+            delay = min(delay * 2, STARTUP_RETRY_MAX_DELAY)
+        try:
+            # Admin-Abgleich nur in einem Prozess; die Lock-Datei bleibt bis zum Prozessende gehalten
+            if self._seed_lock_fd is None:
+                self._seed_lock_fd = try_lock_file(ADMIN_SEED_LOCK_FILE)
+                if self._seed_lock_fd is not None:
+                    with app.app_context():
+                        create_admin_from_config()
+                        db.session.remove()
+            with app.app_context():
+                config_store.get()   # registriert die konfigurierten Docker-Hosts
+                db.session.remove()
+            # Startet die Events-Streams; der erste Resync stößt auch die Label-Discovery an
+            docker_hosts.ensure_fresh()
+        except Exception:
+            app.logger.exception("Startup warm-up failed")
+        self.phase('warm')
+
+startup = StartupState()
+
+@app.before_request
+def _require_database():
+    if request.endpoint in STARTUP_EXEMPT_ENDPOINTS or startup.db_ready.is_set():
+        return
+    startup.start_background()
+    if not startup.db_ready.wait(STARTUP_REQUEST_WAIT):
+        return jsonify({"error": "Starting up, database not ready"}), 503, {'Retry-After': '5'}
+
+@app.after_request
+def _record_first_request(response):
+    if startup.first_request_pending and request.endpoint not in STARTUP_EXEMPT_ENDPOINTS:
+        startup.first_request_pending = False
+        startup.phase('first_request')
+    return response
+
+@app.route('/healthz')
+def healthz_view():
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz_view():
+    database = False
+    if startup.db_ready.is_set():
+        try:
+            db.session.execute(text('SELECT 1'))
+            config_store.get()   # registriert die konfigurierten Docker-Hosts
+            database = True
+        except SQLAlchemyError as e:
+            app.logger.warning("Readiness check failed, database unreachable: %s", e)
+    # Laufender Events-Stream genügt; sonst ein Listing (parallele Probes teilen sich einen Aufruf)
+    docker_hosts.default.status_cache.ensure_fresh()
+    hosts = {backend.name: backend.status_cache.is_fresh() for backend in docker_hosts.all()
+             if backend is not docker_hosts.default}
+    local = docker_hosts.default.status_cache.is_fresh()
+    ready = database and (local or not READY_REQUIRES_DOCKER)
+    payload = {"status": "ready" if ready else "not ready", "database": database, "docker": local, "hosts": hosts}
+    return jsonify(payload), 200 if ready else 503
+
+# ---------------------------
+# Request profiling
+# ---------------------------
+# Admins können einzelne Requests profilieren (Header "X-Profile: 1" oder "?_profile=1"),
+# zusätzlich lässt sich zur Laufzeit ein Anteil aller Requests stichprobenartig erfassen.
+# Erfasst werden Stack-Samples, alle SQL-Statements (inkl. Duplikat-/N+1-Erkennung) und
+# alle Docker-Aufrufe; die Berichte liegen in einem Ringpuffer unter /admin/profiles.
+PROFILE_HISTORY = int(os.environ.get('PROFILE_HISTORY', 50))
+PROFILE_INTERVAL = 0.005          # Sekunden zwischen Stack-Samples
+PROFILE_STACK_DEPTH = 40
+PROFILE_N_PLUS_ONE = 3            # ab so vielen identischen Statements gilt es als N+1-Verdacht
+profiling_settings = {'sample_rate': float(os.environ.get('PROFILE_SAMPLE_RATE', 0))}
+profile_reports = deque(maxlen=PROFILE_HISTORY)
+_active_profile = threading.local()
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(name='profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < PROFILE_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def profiling_requested():
+    if request.endpoint in ('admin_profiles_view', 'admin_profile_detail_view', 'metrics_view', 'static'):
+        return False
+    if request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1':
+        return current_user.is_authenticated and current_user.role == 'admin'
+    rate = profiling_settings['sample_rate']
+    return rate > 0 and random.random() < rate
+
+@app.before_request
+def _profile_before_request():
+    if not profiling_requested():
+        return
+    report = {
+        'id': secrets.token_hex(6),
+        'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'sql': [],
+        'docker': [],
+    }
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    _active_profile.report = report
+    g.profile = (report, sampler, time.perf_counter())
+
+@app.after_request
+def _profile_after_request(response):
+    if 'profile' in g:
+        g.profile[0]['status'] = response.status_code
+    return response
+
+@app.teardown_request
+def _profile_teardown_request(exc):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    report, sampler, started = profile
+    _active_profile.report = None
+    sampler.stop()
+    report['duration'] = time.perf_counter() - started
+    report.setdefault('status', 500 if exc else 200)
+    finish_profile_report(report, sampler)
+    profile_reports.append(report)
+
+def finish_profile_report(report, sampler):
+    report['sql_count'] = len(report['sql'])
+    report['sql_time'] = sum(q['duration'] for q in report['sql'])
+    report['docker_time'] = sum(call['duration'] for call in report['docker'])
+    by_statement = {}
+    for query in report['sql']:
+        entry = by_statement.setdefault(query['statement'], {'statement': query['statement'], 'count': 0, 'duration': 0.0})
+        entry['count'] += 1
+        entry['duration'] += query['duration']
+    report['duplicates'] = sorted((e for e in by_statement.values() if e['count'] > 1),
+                                  key=lambda e: e['count'], reverse=True)
+    report['n_plus_one'] = any(e['count'] >= PROFILE_N_PLUS_ONE for e in report['duplicates'])
+    report['samples'] = sampler.samples
+    report['top_stacks'] = [(count, list(stack)) for stack, count in sampler.stacks.most_common(10)]
+    inclusive = Counter()
+    for stack, count in sampler.stacks.items():
+        for frame in set(stack):
+            inclusive[frame] += count
+    report['top_frames'] = inclusive.most_common(25)
+
+@app.route('/admin/profiles', methods=['GET', 'POST'])
+@login_required
+def admin_profiles_view():
+    if current_user.role != 'admin':
+        flash("Access denied.", "danger")
+        return redirect(url_for('index'))
+    if request.method == 'POST':
+        try:
+            rate = float(request.form.get('sample_rate', 0))
+        except ValueError:
+            rate = -1
+        if 0 <= rate <= 1:
+            profiling_settings['sample_rate'] = rate
+            flash("Profiling sample rate updated.", "success")
+        else:
+            flash("Sample rate must be between 0 and 1.", "danger")
+        return redirect(url_for('admin_profiles_view'))
+    return render_template('admin_profiles.html', reports=list(reversed(profile_reports)),
+                           sample_rate=profiling_settings['sample_rate'])
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+@login_required
+def admin_profile_detail_view(profile_id):
+    if current_user.role != 'admin':
+        flash("Access denied.", "danger")
+        return redirect(url_for('index'))
+    report = next((r for r in list(profile_reports) if r['id'] == profile_id), None)
+    if report is None:
+        flash("Profile not found.", "danger")
+        return redirect(url_for('admin_profiles_view'))
+    return render_template('admin_profile_detail.html', report=report)
+
+@app.route('/metrics')
+def metrics_view():
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    body = '\n'.join(m.render() for m in METRICS) + '\n'
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+# ---------------------------
+# Docker client
+# ---------------------------
+# Der Client wird erst beim ersten Aufruf angelegt (kein Daemon-Call beim Import) und hat
+# kurze Timeouts. Antwortet der Daemon wiederholt nicht, öffnet der Circuit Breaker: Aufrufe
+# schlagen dann sofort mit DockerUnavailable fehl, Statusabfragen liefern den zuletzt
+# bekannten Stand aus dem Cache (als "stale" markiert), statt Threads zu blockieren.
+DOCKER_TIMEOUT = float(os.environ.get('DOCKER_TIMEOUT', 5))                   # Inspect, Liste, Logs
+DOCKER_ACTION_TIMEOUT = float(os.environ.get('DOCKER_ACTION_TIMEOUT', 30))    # Start; bei Stop zusätzlich zum Stop-Timeout
+DOCKER_POOL_SIZE = int(os.environ.get('DOCKER_POOL_SIZE', os.environ.get('WEB_THREADS', 16)))  # Verbindungen pro Prozess
+DOCKER_BREAKER_THRESHOLD = int(os.environ.get('DOCKER_BREAKER_THRESHOLD', 3))  # Fehlschläge in Folge bis zum Öffnen
+DOCKER_BREAKER_COOLDOWN = float(os.environ.get('DOCKER_BREAKER_COOLDOWN', 15))  # Sekunden bis zum nächsten Versuch
+
+DOCKER_BREAKER_OPEN = metric('docker_circuit_open', 'Whether the Docker circuit breaker of a host is open.', 'gauge', ('host',))
+
+class DockerUnavailable(docker.errors.APIError):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, host='local', threshold=DOCKER_BREAKER_THRESHOLD, cooldown=DOCKER_BREAKER_COOLDOWN):
+        self.host = host
+        self.gauge = DOCKER_BREAKER_OPEN.labels(host)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def check(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            # Nach dem Cooldown darf ein einzelner Probe-Aufruf durch, danach wieder warten
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                self._opened_at = time.monotonic()
+                return
+        raise DockerUnavailable("Docker daemon unavailable",
+                                explanation=f"Docker daemon {self.host} not responding (circuit open, retry every {self.cooldown:g}s)")
+
+    def success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                app.logger.info("Docker daemon %s responding again, circuit closed", self.host)
+            self._failures = 0
+            self._opened_at = None
+        self.gauge.set(0)
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is None and self._failures >= self.threshold:
+                app.logger.warning("Docker daemon %s not responding after %d attempts, circuit opened",
+                                   self.host, self._failures)
+                self._opened_at = time.monotonic()
+            elif self._opened_at is not None:
+                self._opened_at = time.monotonic()
+            is_open = self._opened_at is not None
+        self.gauge.set(1 if is_open else 0)
+
+docker_breaker = CircuitBreaker()
+
+class DockerClientManager:
+    def __init__(self, breaker, timeout=DOCKER_TIMEOUT, pool_size=DOCKER_POOL_SIZE, base_url=None):
+        self.breaker = breaker
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.base_url = base_url   # None: DOCKER_HOST bzw. lokaler Socket
+        self._lock = threading.Lock()
+        self._client = None
+
+    def _create(self):
+        if self.base_url:
+            docker_client = docker.DockerClient(base_url=self.base_url, timeout=self.timeout, max_pool_size=self.pool_size)
+        else:
+            docker_client = docker.DockerClient.from_env(timeout=self.timeout, max_pool_size=self.pool_size)
+        if docker_client.api.base_url == 'http+docker://localhost':
+            # Unix-Socket: Proxy-Variablen gelten hier nicht, requests muss sie nicht bei jedem Call auswerten
+            docker_client.api.trust_env = False
+        instrument_docker_client(docker_client)
+        return docker_client
+
+    # Führt fn(client) aus; Timeouts und Verbindungsfehler zählen für den Circuit Breaker
+    def call(self, fn):
+        self.breaker.check()
+        try:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create()
+                docker_client = self._client
+            result = fn(docker_client)
+        except docker.errors.APIError:
+            # Der Daemon hat geantwortet (z.B. 404), nur eben mit einem Fehler
+            self.breaker.success()
+            raise
+        except (requests.exceptions.RequestException, docker.errors.DockerException, OSError) as e:
+            self.breaker.failure()
+            raise DockerUnavailable("Docker daemon unavailable", explanation=str(e)) from e
+        self.breaker.success()
+        return result
+
+    def reset(self):
+        # Nach fork(): keine Verbindungen des Elternprozesses weiterverwenden
+        self._lock = threading.Lock()
+        self._client = None
+
+    # Host entfernt: offene Verbindungen (auch einen laufenden Events-Stream) schließen
+    def close(self):
+        with self._lock:
+            docker_client, self._client = self._client, None
+        if docker_client is not None:
+            docker_client.close()
+
+docker_clients = DockerClientManager(docker_breaker)
+
+# ---------------------------
+# Request coalescing
+# ---------------------------
+# Gleichzeitige, identische Abfragen (z.B. Dutzende Status-Requests nach einem Neustart von
+# Home Assistant) teilen sich einen Daemon-Call: wer dazukommt, während der Call läuft, wartet
+# auf dessen Ergebnis (oder Fehler). Das erste Element des Schlüssels ist die Art des Calls.
+COALESCED_CALLS = metric('docker_calls_coalesced_total', 'Docker calls answered by an identical call already in flight.', 'counter', ('kind',))
+
+# Für Threads (synchroner Docker-Client)
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # Schlüssel -> concurrent.futures.Future
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if not owner:
+            COALESCED_CALLS.labels(key[0]).inc()
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._done(key)
+            future.set_exception(e)
+            raise
+        self._done(key)
+        future.set_result(result)
+        return result
+
+    def _done(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+# Für Coroutinen im Docker-Loop (ein Thread, daher ohne Lock)
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls = {}   # Schlüssel -> asyncio.Task
+
+    async def do(self, key, coro_fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda done: self._calls.pop(key, None) if self._calls.get(key) is done else None)
+        else:
+            COALESCED_CALLS.labels(key[0]).inc()
+        # shield: bricht ein Wartender ab (Timeout), läuft der Call für die anderen weiter
+        return await asyncio.shield(task)
+
+    def reset(self):
+        self._calls = {}
+
+# ---------------------------
+# Container status cache
+# ---------------------------
+# Prozessweiter Cache für Container-Status: wird einmal über die Container-Liste
+# befüllt und danach vom Docker-Events-Stream aktuell gehalten. Statusabfragen
+# sind damit reine Speicherzugriffe ohne Socket-Traffic.
+STATUS_CACHE_RESYNC_INTERVAL = int(os.environ.get('STATUS_CACHE_RESYNC_INTERVAL', 300))  # Vollabgleich alle X Sekunden
+STATUS_CACHE_STALE_AFTER = int(os.environ.get('STATUS_CACHE_STALE_AFTER', 10))  # Gültigkeit ohne Lebenszeichen des Streams
+# Der Events-Stream wird in solchen Fenstern abonniert: der Daemon beendet ihn am Fensterende, das
+# ist auch ohne Events ein Lebenszeichen. Bleibt das Ende aus, hängt der Stream und wird neu aufgebaut.
+STATUS_CACHE_EVENTS_WINDOW = int(os.environ.get('STATUS_CACHE_EVENTS_WINDOW', 30))
+STATUS_CACHE_RETRY_DELAY = 5
+
+# Docker event action -> resulting container status (None = entry is removed)
+EVENT_STATUS = {
+    'create': 'created',
+    'start': 'running',
+    'restart': 'running',
+    'unpause': 'running',
+    'pause': 'paused',
+    'die': 'exited',
+    'stop': 'exited',
+    'destroy': None,
+}
+
+# Verteilt Statusänderungen an beliebig viele Abonnenten (SSE). Statt einer Queue pro
+# Client gibt es einen gemeinsamen Ringpuffer mit Sequenznummern; wartende Clients
+# schlafen auf einer Condition und kosten im Leerlauf nichts.
+STATUS_BROADCAST_BUFFER = 1000
+
+class StatusBroadcaster:
+    def __init__(self, size=STATUS_BROADCAST_BUFFER):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._changes = deque(maxlen=size)   # (seq, (host_id, docker_name), status)
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, key, status):
+        with self._cond:
+            self._seq += 1
+            self._changes.append((self._seq, key, status))
+            self._cond.notify_all()
+
+    # Gibt (neue Sequenznummer, Änderungen seit "since") zurück. Änderungen ist None,
+    # wenn der Client zu langsam war und Einträge bereits aus dem Puffer gefallen sind.
+    def wait(self, since, timeout):
+        with self._cond:
+            if self._seq == since:
+                self._cond.wait(timeout)
+            if self._seq == since:
+                return since, []
+            if not self._changes or self._changes[0][0] > since + 1:
+                return self._seq, None
+            start = len(self._changes) - (self._seq - since)
+            return self._seq, [self._changes[i] for i in range(start, len(self._changes))]
+
+status_broadcaster = StatusBroadcaster()
+
+class ContainerStatusCache:
+    def __init__(self, docker_clients, broadcaster=None, host_id=None, listeners=None):
+        self.docker = docker_clients
+        self.broadcaster = broadcaster
+        self.host_id = host_id  # None: lokaler Daemon
+        self._lock = threading.Lock()
+        self._containers = {}   # docker id -> {'name': ..., 'status': ...}
+        self._names = {}        # docker name -> docker id
+        self._synced_at = 0.0
+        self._alive_at = None   # monotonic: letztes Lebenszeichen des Events-Streams (None: kein Stream)
+        self._thread = None
+        self._stopped = False
+        self._inflight = SingleFlight()
+        # erhalten Container-Listen (Resync) und create/rename-Events, jeweils mit der Host-ID
+        self.listeners = [] if listeners is None else listeners
+
+    def start(self):
+        with self._lock:
+            if self._stopped or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='status-cache', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self.docker.close()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self.resync()
+                since = self._synced_at
+                resync_at = time.monotonic() + STATUS_CACHE_RESYNC_INTERVAL
+                # Ein Stream pro Fenster; "since" stellt sicher, dass zwischen zwei Fenstern keine
+                # Events fehlen. Nach dem Resync-Intervall folgt zusätzlich ein Vollabgleich.
+                while not self._stopped:
+                    until = time.time() + STATUS_CACHE_EVENTS_WINDOW
+                    self._follow_events(since, until)
+                    since = until
+                    if time.monotonic() >= resync_at:
+                        self.resync()
+                        resync_at = time.monotonic() + STATUS_CACHE_RESYNC_INTERVAL
+            except Exception as e:
+                if self._stopped:
+                    return
+                app.logger.warning("Docker events stream lost, resyncing: %s", e)
+            self._alive_at = None
+            time.sleep(STATUS_CACHE_RETRY_DELAY)
+
+    def _follow_events(self, since, until):
+        events = self.docker.call(lambda c: c.events(decode=True, since=since, until=until,
+                                                     filters={'type': 'container'}))
+        self._alive_at = time.monotonic()
+        # Endet der Stream nicht rechtzeitig, schließt ihn der Watchdog (CancellableStream.close)
+        stalled = threading.Event()
+
+        def watchdog():
+            stalled.set()
+            events.close()
+        timer = threading.Timer(STATUS_CACHE_EVENTS_WINDOW + STATUS_CACHE_STALE_AFTER, watchdog)
+        timer.daemon = True
+        timer.start()
+        try:
+            for evt in events:
+                self._alive_at = time.monotonic()
+                self.apply_event(evt)
+        except Exception:
+            if not stalled.is_set():
+                raise
+        finally:
+            timer.cancel()
+        if stalled.is_set():
+            raise DockerUnavailable("Docker events stream stalled",
+                                    explanation=f"no end of the events stream after {STATUS_CACHE_EVENTS_WINDOW}s window")
+        self._alive_at = time.monotonic()
+
+    def resync(self):
+        # Low-level-Liste: ein einziger Daemon-Call statt eines Inspects pro Container
+        synced_at = time.time()
+        containers = {}
+        names = {}
+        listing = self.docker.call(lambda c: c.api.containers(all=True))
+        for c in listing:
+            name = c['Names'][0].lstrip('/') if c.get('Names') else c['Id'][:12]
+            containers[c['Id']] = {'name': name, 'status': c.get('State', 'unknown')}
+            names[name] = c['Id']
+        for listener in self.listeners:
+            listener.on_resync(listing, self.host_id)
+        with self._lock:
+            old_names = self._names
+            old_containers = self._containers
+            self._containers = containers
+            self._names = names
+            self._synced_at = synced_at
+        # Abweichungen, die ohne Event entstanden sind (z.B. nach Stream-Abbruch), melden
+        for name in set(old_names) | set(names):
+            old = old_containers.get(old_names.get(name), {}).get('status', "not found")
+            new = containers.get(names.get(name), {}).get('status', "not found")
+            if old != new:
+                self._publish(name, new)
+
+    def _publish(self, docker_name, status):
+        if self.broadcaster is not None:
+            self.broadcaster.publish((self.host_id, docker_name), status)
+
+    def apply_event(self, event):
+        action = event.get('Action') or event.get('status') or ''
+        action = action.split(':')[0]
+        actor = event.get('Actor') or {}
+        cont_id = actor.get('ID') or event.get('id')
+        attrs = actor.get('Attributes') or {}
+        if not cont_id:
+            return
+        changes = []
+        with self._lock:
+            entry = self._containers.get(cont_id)
+            if action == 'rename':
+                old_name = attrs.get('oldName', '').lstrip('/')
+                self._names.pop(old_name, None)
+                changes.append((old_name, "not found"))
+                if entry:
+                    entry['name'] = attrs.get('name', entry['name'])
+                    self._names[entry['name']] = cont_id
+                    changes.append((entry['name'], entry['status']))
+            elif action in EVENT_STATUS:
+                status = EVENT_STATUS[action]
+                if status is None:
+                    if entry:
+                        self._names.pop(entry['name'], None)
+                        del self._containers[cont_id]
+                        changes.append((entry['name'], "not found"))
+                elif entry is None:
+                    entry = {'name': attrs.get('name', cont_id[:12]), 'status': status}
+                    self._containers[cont_id] = entry
+                    self._names[entry['name']] = cont_id
+                    changes.append((entry['name'], status))
+                elif entry['status'] != status:
+                    entry['status'] = status
+                    changes.append((entry['name'], status))
+        for name, status in changes:
+            self._publish(name, status)
+        if action in ('create', 'rename'):
+            for listener in self.listeners:
+                listener.on_event(action, cont_id, attrs, self.host_id)
+
+    # Aktuell, solange der Events-Stream innerhalb seines Fensters (plus Toleranz) ein Lebenszeichen
+    # gegeben hat; ohne Stream nur kurz nach dem letzten Vollabgleich
+    def is_fresh(self):
+        if not self._synced_at:
+            return False
+        alive_at = self._alive_at
+        if alive_at is not None and time.monotonic() - alive_at < STATUS_CACHE_EVENTS_WINDOW + STATUS_CACHE_STALE_AFTER:
+            return True
+        return time.time() - self._synced_at < STATUS_CACHE_STALE_AFTER
+
+    def _lookup(self, docker_name, docker_id=None):
+        # Bekannte Container-ID zuerst: übersteht Umbenennungen ohne Namenssuche
+        if docker_id in self._containers:
+            return self._containers[docker_id]
+        cont_id = self._names.get(docker_name)
+        if cont_id is None and docker_name in self._containers:
+            cont_id = docker_name
+        if cont_id is None and len(docker_name) >= 12 and all(ch in '0123456789abcdef' for ch in docker_name):
+            # Kurze Container-IDs (Präfix) wie bei "docker ps"
+            for full_id in self._containers:
+                if full_id.startswith(docker_name):
+                    cont_id = full_id
+                    break
+        return self._containers.get(cont_id) if cont_id else None
+
+    def ensure_fresh(self):
+        self.start()
+        if not self.is_fresh():
+            try:
+                # Mehrere Requests mit kaltem Cache: nur einer listet, die anderen warten darauf
+                self._inflight.do(('resync',), self.resync)
+            except DockerUnavailable:
+                pass
+
+    # Zuletzt bekannter Status, unabhängig davon, wie alt er ist
+    def last_known(self, docker_name, docker_id=None):
+        with self._lock:
+            entry = self._lookup(docker_name, docker_id)
+        if entry:
+            return entry['status']
+        return "not found" if self._synced_at else "unknown"
+
+    # Status aus dem Cache oder None, wenn der Cache kalt bzw. veraltet ist
+    def cached(self, docker_name, docker_id=None):
+        self.start()
+        if not self.is_fresh():
+            return None
+        with self._lock:
+            entry = self._lookup(docker_name, docker_id)
+        return entry['status'] if entry else "not found"
+
+    def get(self, docker_name, docker_id=None):
+        status = self.cached(docker_name, docker_id)
+        if status is not None:
+            return status
+        # Cache kalt oder veraltet: direkter Inspect als Fallback
+        try:
+            docker_cont = self._inflight.do(('inspect', docker_name),
+                                            lambda: self.docker.call(lambda c: c.containers.get(docker_name)))
+        except docker.errors.NotFound:
+            return "not found"
+        except DockerUnavailable:
+            return self.last_known(docker_name, docker_id)
+        self.set(docker_cont.id, docker_cont.name, docker_cont.status)
+        return docker_cont.status
+
+    def set(self, cont_id, name, status):
+        with self._lock:
+            entry = self._containers.get(cont_id)
+            changed = entry is None or entry['status'] != status or entry['name'] != name
+            if entry is None:
+                self._containers[cont_id] = {'name': name, 'status': status}
+            else:
+                if entry['name'] != name:
+                    self._names.pop(entry['name'], None)
+                entry['name'] = name
+                entry['status'] = status
+            self._names[name] = cont_id
+        if changed:
+            self._publish(name, status)
+
+status_cache = ContainerStatusCache(docker_clients, status_broadcaster)
+
+def get_container_status(docker_name, docker_id=None, host_id=None):
+    return docker_hosts.get(host_id).status_cache.get(docker_name, docker_id)
+
+# Statuswerte stammen aus einem veralteten Cache, weil der Daemon (eines der Hosts der
+# angegebenen Container bzw. irgendeines Hosts) nicht antwortet
+def status_is_stale(containers=None):
+    if containers is None:
+        backends = docker_hosts.all()
+    else:
+        backends = [docker_hosts.get(host_id) for host_id in {c.host_id for c in containers}]
+    return any(backend.breaker.is_open and not backend.status_cache.is_fresh() for backend in backends)
+
+# Nach einem Start/Stop den neuen Status sofort übernehmen, ohne auf das Event zu warten
+def mark_container_status(cont_id, name, action, host_id=None):
+    docker_hosts.get(host_id).status_cache.set(cont_id, name, 'running' if action == 'start' else 'exited')
+
+# ---------------------------
+# Async Docker client
+# ---------------------------
+# API-Endpunkte und Gruppen-Orchestrierung sprechen die Engine-API über einen eigenen
+# Event-Loop-Thread an: wartende Docker-Calls belegen keinen Thread, die Container einer
+# Gruppe laufen per gather() gleichzeitig. Verbindungen zum Socket bleiben (keep-alive)
+# in einem Pool. Fehler werden wie beim docker-SDK als docker.errors.* gemeldet.
+DOCKER_ASYNC_POOL_SIZE = int(os.environ.get('DOCKER_ASYNC_POOL_SIZE', 16))      # max. offene Verbindungen
+DOCKER_ASYNC_CONCURRENCY = int(os.environ.get('DOCKER_ASYNC_CONCURRENCY', 16))  # gleichzeitige Abfragen pro Request
+
+# Profil des aufrufenden Requests, damit Calls im Loop-Thread mitgeschrieben werden
+_docker_profile = contextvars.ContextVar('docker_profile', default=None)
+
+# Alle Docker-Hosts teilen sich einen Loop-Thread; Coroutinen können so Calls an
+# mehrere Hosts per gather() gleichzeitig absetzen.
+class AsyncDockerClient:
+    _loop = None
+    _loop_lock = threading.Lock()
+
+    def __init__(self, base_url, breaker, pool_size=DOCKER_ASYNC_POOL_SIZE, timeout=DOCKER_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.socket_path = parts.path
+        self.address = (parts.hostname, parts.port)
+        self.breaker = breaker
+        self.api_version = None   # beim ersten Call mit dem Daemon ausgehandelt
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = []       # freie (reader, writer)-Paare
+        self._slots = None    # Semaphore über alle Verbindungen, im Loop angelegt
+
+    @classmethod
+    def _get_loop(cls):
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name='docker-async', daemon=True).start()
+            return cls._loop
+
+    def reset(self):
+        # Nach fork(): Loop-Thread und Verbindungen des Elternprozesses existieren nicht mehr
+        AsyncDockerClient._loop_lock = threading.Lock()
+        AsyncDockerClient._loop = None
+        self._idle = []
+        self._slots = None
+
+    # Host entfernt: Verbindungen im Pool schließen (im Loop-Thread)
+    def close(self):
+        idle, self._idle = self._idle, []
+        loop = AsyncDockerClient._loop
+        if loop is not None:
+            for _, writer in idle:
+                loop.call_soon_threadsafe(writer.close)
+
+    # Plant eine Coroutine im Loop-Thread ein und gibt ein concurrent.futures.Future zurück
+    def submit(self, coro):
+        profile = getattr(_active_profile, 'report', None)
+        return asyncio.run_coroutine_threadsafe(self._with_profile(coro, profile), self._get_loop())
+
+    # Führt eine Coroutine im Loop-Thread aus und wartet auf das Ergebnis
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    @staticmethod
+    async def _with_profile(coro, profile):
+        _docker_profile.set(profile)
+        return await coro
+
+    async def _connect(self):
+        if self.scheme == 'http+unix':
+            return await asyncio.open_unix_connection(self.socket_path)
+        if self.scheme == 'http':
+            return await asyncio.open_connection(*self.address)
+        raise docker.errors.DockerException(f"Async Docker client does not support {self.scheme}:// endpoints")
+
+    @staticmethod
+    async def _send_head(reader, writer, method, url):
+        writer.write(f'{method} {url} HTTP/1.1\r\nHost: docker\r\nContent-Length: 0\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by Docker daemon")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        return status, headers
+
+    @classmethod
+    async def _exchange(cls, reader, writer, method, url):
+        status, headers = await cls._send_head(reader, writer, method, url)
+        body, keep_alive = await cls._read_body(reader, status, headers)
+        return status, headers, body, keep_alive
+
+    @staticmethod
+    async def _read_body(reader, status, headers):
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if status in (204, 304) or status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return body, keep_alive
+
+    async def _call(self, method, url):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            # Eine wiederverwendete Verbindung kann der Daemon inzwischen geschlossen haben
+            for reused in ((True, False) if self._idle else (False,)):
+                conn = self._idle.pop() if reused else await self._connect()
+                try:
+                    status, headers, body, keep_alive = await self._exchange(*conn, method, url)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn[1].close()
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    conn[1].close()
+                    raise
+                if keep_alive:
+                    self._idle.append(conn)
+                else:
+                    conn[1].close()
+                return status, headers, body
+
+    async def _url(self, path, params=None):
+        self.breaker.check()
+        if self.api_version is None:
+            status, headers, body = await self._send('GET', '/version', self.timeout)
+            self.api_version = json.loads(body)['ApiVersion']
+        url = f'/v{self.api_version}{path}'
+        if params:
+            url += '?' + urlencode(params)
+        return url
+
+    @staticmethod
+    def _raise_for_status(status, body, method, path):
+        if status >= 400:
+            try:
+                explanation = json.loads(body).get('message')
+            except ValueError:
+                explanation = body.decode('utf-8', 'replace')
+            error_class = docker.errors.NotFound if status == 404 else docker.errors.APIError
+            raise error_class(f"{status} error for {method} {path}", explanation=explanation)
+
+    async def request(self, method, path, params=None, timeout=None):
+        url = await self._url(path, params)
+        status, headers, body = await self._send(method, url, timeout or self.timeout)
+        self._raise_for_status(status, body, method, path)
+        if body and headers.get('content-type', '').startswith('application/json'):
+            return json.loads(body)
+        return body
+
+    async def _send(self, method, url, timeout):
+        started = time.perf_counter()
+        status = None
+        try:
+            status, headers, body = await asyncio.wait_for(self._call(method, url), timeout)
+        except asyncio.TimeoutError:
+            self.breaker.failure()
+            raise DockerUnavailable(f"{method} {url}", explanation=f"Docker API call timed out after {timeout:g}s")
+        except OSError as e:
+            self.breaker.failure()
+            raise DockerUnavailable(f"{method} {url}", explanation=f"Docker daemon not reachable: {e}")
+        finally:
+            record_docker_call(method, url, status, time.perf_counter() - started, _docker_profile.get())
+        self.breaker.success()
+        return status, headers, body
+
+    async def inspect(self, name):
+        return await self.request('GET', f'/containers/{quote(name, safe="")}/json')
+
+    async def start(self, name):
+        await self.request('POST', f'/containers/{quote(name, safe="")}/start', timeout=DOCKER_ACTION_TIMEOUT)
+
+    async def stop(self, name, stop_timeout):
+        # Der Daemon antwortet erst nach dem Stoppen (spätestens nach stop_timeout + SIGKILL)
+        await self.request('POST', f'/containers/{quote(name, safe="")}/stop', {'t': stop_timeout},
+                           timeout=stop_timeout + DOCKER_ACTION_TIMEOUT)
+
+    async def logs(self, name, since, until, tty=False):
+        body = await self.request('GET', f'/containers/{quote(name, safe="")}/logs',
+                                  {'stdout': 1, 'stderr': 1, 'since': since, 'until': until})
+        if tty:
+            return body
+        # Ohne TTY sind stdout/stderr in Frames mit 8-Byte-Header gemultiplext
+        output = []
+        pos = 0
+        while pos + 8 <= len(body):
+            size = int.from_bytes(body[pos + 4:pos + 8], 'big')
+            output.append(body[pos + 8:pos + 8 + size])
+            pos += 8 + size
+        return b''.join(output)
+
+    # Log-Stream über eine eigene Verbindung (nicht aus dem Pool, sie kann lange offen bleiben).
+    # Nur der Antwortkopf wird hier gelesen, den Body liest DockerLogStream blockweise.
+    async def open_logs(self, name, params, tty=False):
+        path = f'/containers/{quote(name, safe="")}/logs'
+        url = await self._url(path, params)
+        started = time.perf_counter()
+        status = None
+        try:
+            reader, writer = await asyncio.wait_for(self._connect(), self.timeout)
+            try:
+                status, headers = await asyncio.wait_for(self._send_head(reader, writer, 'GET', url), self.timeout)
+                if status >= 400:
+                    body, _ = await asyncio.wait_for(self._read_body(reader, status, headers), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+        except asyncio.TimeoutError:
+            self.breaker.failure()
+            raise DockerUnavailable(f"GET {url}", explanation=f"Docker API call timed out after {self.timeout:g}s")
+        except OSError as e:
+            self.breaker.failure()
+            raise DockerUnavailable(f"GET {url}", explanation=f"Docker daemon not reachable: {e}")
+        finally:
+            record_docker_call('GET', url, status, time.perf_counter() - started, _docker_profile.get())
+        self.breaker.success()
+        if status >= 400:
+            writer.close()
+            self._raise_for_status(status, body, 'GET', path)
+        return DockerLogStream(reader, writer, headers, tty)
+
+    async def stats(self, name):
+        # one-shot: sofortige Antwort statt Warten auf ein zweites Sample (API >= 1.41)
+        return await self.request('GET', f'/containers/{quote(name, safe="")}/stats', {'stream': 0, 'one-shot': 1})
+
+docker_async = AsyncDockerClient(docker.utils.parse_host(os.environ.get('DOCKER_HOST')), docker_breaker)
+
+status_inflight = AsyncSingleFlight()
+
+async def container_status_async(docker_name, docker_id=None, host_id=None):
+    backend = docker_hosts.get(host_id)
+    status = backend.status_cache.cached(docker_name, docker_id)
+    if status is not None:
+        return status
+    try:
+        # Timeout und Circuit Breaker des jeweiligen Hosts: ein hängender Daemon bremst nur seine Container.
+        # Gleichzeitige Abfragen desselben Containers teilen sich einen Inspect.
+        info = await status_inflight.do(('inspect', host_id, docker_name), lambda: backend.api.inspect(docker_name))
+    except docker.errors.NotFound:
+        return "not found"
+    except DockerUnavailable:
+        return backend.status_cache.last_known(docker_name, docker_id)
+    status = info['State']['Status']
+    backend.status_cache.set(info['Id'], info['Name'].lstrip('/'), status)
+    return status
+
+# Status mehrerer Container (ContainerInfo), auch über mehrere Hosts. Container auf Hosts mit
+# aktuellem Cache kosten nichts; für die übrigen laufen die Inspects gleichzeitig.
+def get_container_statuses(containers, concurrency=DOCKER_ASYNC_CONCURRENCY):
+    statuses = [docker_hosts.get(c.host_id).status_cache.cached(c.docker_name, c.docker_id) for c in containers]
+    missing = [i for i, status in enumerate(statuses) if status is None]
+    if not missing:
+        return statuses
+
+    async def gather_statuses():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(cont):
+            async with limit:
+                return await container_status_async(cont.docker_name, cont.docker_id, cont.host_id)
+        return await asyncio.gather(*(one(containers[i]) for i in missing))
+    for i, status in zip(missing, docker_async.run(gather_statuses())):
+        statuses[i] = status
+    return statuses
+
+# ---------------------------
+# Docker hosts
+# ---------------------------
+# Neben dem lokalen Daemon (DOCKER_HOST) können weitere Hosts als DockerHost-Zeilen angelegt
+# werden. Jeder Host hat eigene Verbindungen, einen eigenen Circuit Breaker, eigene Timeouts und
+# einen eigenen Status-Cache samt Events-Stream; ein langsamer Host hält die anderen nicht auf.
+# Die Registry folgt dem Config-Snapshot (neue, geänderte und entfernte Hosts).
+HostInfo = namedtuple('HostInfo', 'id name url timeout')
+
+class DockerHostBackend:
+    def __init__(self, host_id, name, url, timeout, breaker, clients, api, status_cache):
+        self.host_id = host_id
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.breaker = breaker
+        self.clients = clients
+        self.api = api
+        self.status_cache = status_cache
+
+    @classmethod
+    def create(cls, host, broadcaster, listeners):
+        timeout = host.timeout or DOCKER_TIMEOUT
+        breaker = CircuitBreaker(host.name)
+        clients = DockerClientManager(breaker, timeout=timeout, base_url=host.url)
+        api = AsyncDockerClient(docker.utils.parse_host(host.url), breaker, timeout=timeout)
+        cache = ContainerStatusCache(clients, broadcaster, host.id, listeners)
+        return cls(host.id, host.name, host.url, host.timeout, breaker, clients, api, cache)
+
+    def reset(self):
+        self.clients.reset()
+        self.api.reset()
+
+    def close(self):
+        self.status_cache.stop()
+        self.api.close()
+
+class DockerHostRegistry:
+    def __init__(self, default, broadcaster):
+        self.default = default
+        self.broadcaster = broadcaster
+        self.listeners = default.status_cache.listeners   # gemeinsam für alle Hosts
+        self._lock = threading.Lock()
+        self._backends = {}   # DockerHost-ID -> DockerHostBackend
+
+    # Mit den Hosts eines neuen Config-Snapshots abgleichen
+    def configure(self, hosts):
+        with self._lock:
+            for host_id, backend in list(self._backends.items()):
+                host = hosts.get(host_id)
+                if host is None or (host.url, host.timeout) != (backend.url, backend.timeout):
+                    del self._backends[host_id]
+                    backend.close()
+            for host_id, host in hosts.items():
+                backend = self._backends.get(host_id)
+                if backend is None:
+                    self._backends[host_id] = DockerHostBackend.create(host, self.broadcaster, self.listeners)
+                else:
+                    backend.name = host.name
+
+    # None steht für den lokalen Daemon
+    def get(self, host_id):
+        if host_id is None:
+            return self.default
+        backend = self._backends.get(host_id)
+        if backend is None:
+            raise DockerUnavailable("Unknown Docker host", explanation=f"Docker host {host_id} is not configured")
+        return backend
+
+    def all(self):
+        return [self.default, *self._backends.values()]
+
+    # Veraltete Caches aller Hosts gleichzeitig per Listing auffrischen
+    def ensure_fresh(self):
+        stale = []
+        for backend in self.all():
+            backend.status_cache.start()
+            if not backend.status_cache.is_fresh():
+                stale.append(backend.status_cache)
+        if len(stale) == 1:
+            stale[0].ensure_fresh()
+        elif stale:
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                list(executor.map(ContainerStatusCache.ensure_fresh, stale))
+
+    def reset(self):
+        for backend in self.all():
+            backend.reset()
+
+docker_hosts = DockerHostRegistry(
+    DockerHostBackend(None, 'local', None, None, docker_breaker, docker_clients, docker_async, status_cache),
+    status_broadcaster)
+
+# ---------------------------
+# Icons
+# ---------------------------
+# Hochgeladene Icons werden auf die Anzeigegröße (1x/2x) verkleinert, als WebP gespeichert und
+# nach dem Inhalt benannt ("icons/<hash>@1x.webp"). Gleiche Uploads teilen sich die Dateien,
+# Namenskollisionen gibt es nicht und die Dateien können unbegrenzt gecacht werden.
+ICON_SIZE = 50                  # Anzeigegröße im Dashboard (px)
+ICON_SCALES = (1, 2)
+ICON_NAME = re.compile(r'^icons/([0-9a-f]{16})@1x\.(\w+)$')
+ICON_FILE = re.compile(r'^icons/[0-9a-f]{16}@\d+x\.\w+$')
+ICON_MAX_AGE = 365 * 24 * 3600  # Sekunden für gehashte Dateinamen
+LEGACY_ICON_MAX_AGE = 3600      # alte Uploads unter Originalnamen
+
+def save_icon(file):
+    data = file.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    upload_folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    # Pillow erst beim ersten Upload laden (verkürzt den Kaltstart)
+    try:
+        from PIL import Image, ImageOps, features as pil_features
+    except ImportError:  # Pillow fehlt: Icons werden unverändert gespeichert
+        Image = None
+    if Image is None:
+        ext = os.path.splitext(secure_filename(file.filename))[1].lower() or '.png'
+        with open(os.path.join(upload_folder, f'{digest}@1x{ext}'), 'wb') as f:
+            f.write(data)
+        return f'icons/{digest}@1x{ext}'
+    ext, fmt = ('webp', 'WEBP') if pil_features.check('webp') else ('png', 'PNG')
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img).convert('RGBA')
+            for scale in ICON_SCALES:
+                variant = img.copy()
+                variant.thumbnail((ICON_SIZE * scale, ICON_SIZE * scale), Image.LANCZOS)
+                tmp_path = os.path.join(upload_folder, f'.{digest}@{scale}x.{ext}.{os.getpid()}')
+                if fmt == 'WEBP':
+                    variant.save(tmp_path, fmt, quality=85, method=6)
+                else:
+                    variant.save(tmp_path, fmt, optimize=True)
+                os.replace(tmp_path, os.path.join(upload_folder, f'{digest}@{scale}x.{ext}'))
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image: {e}")
+    return f'icons/{digest}@1x.{ext}'
+
+def icon_variants(icon):
+    match = ICON_NAME.match(icon or '')
+    if not match:
+        return [icon] if icon else []
+    return [f'icons/{match.group(1)}@{scale}x.{match.group(2)}' for scale in ICON_SCALES]
+
+# srcset-Attribut für hochauflösende Displays (alte Uploads haben nur eine Variante)
+@app.template_global()
+def icon_srcset(icon):
+    return ', '.join(f"{url_for('data_static', filename=path)} {scale}x"
+                     for scale, path in zip(ICON_SCALES, icon_variants(icon)))
+
+# Löscht die Dateien eines ersetzten Icons, sofern kein anderer Container/keine Gruppe es nutzt
+def remove_unused_icon(icon):
+    if not icon or Container.query.filter_by(icon=icon).first() or Group.query.filter_by(icon=icon).first():
+        return
+    for path in icon_variants(icon):
+        try:
+            os.remove(os.path.join(DATA_DIR, path))
+        except OSError:
+            pass
+
+# Route, um Icons aus dem data-Ordner bereitzustellen (gehashte Namen mit ETag und immutable)
 @app.route('/data/<path:filename>')
 def data_static(filename):
-    return send_from_directory(os.path.join(app.root_path, 'data'), filename)
+    if not filename.startswith('icons/'):
+        return "Not found", 404
+    hashed = ICON_FILE.match(filename)
+    response = send_from_directory(DATA_DIR, filename,
+                                   max_age=ICON_MAX_AGE if hashed else LEGACY_ICON_MAX_AGE)
+    if hashed:
+        response.cache_control.immutable = True
+    return response
 
 # --------------------------------------------------------------------
 # Model for many-to-many relationship with extra attributes (for groups)
@@ -38,19 +1480,33 @@ class GroupContainer(db.Model):
     container_id = db.Column(db.Integer, db.ForeignKey('container.id'), primary_key=True)
     startup_order = db.Column(db.Integer, default=0)
     delay = db.Column(db.Integer, default=0)  # Delay in seconds
+    # Optionale Bereitschaftsprüfung statt fester Wartezeit: "healthy", "tcp" oder "log"
+    ready_check = db.Column(db.String(10), nullable=True)
+    ready_target = db.Column(db.String(200), nullable=True)   # "port" / "host:port" bzw. Regex für "log"
+    ready_timeout = db.Column(db.Integer, default=60)         # Sekunden, danach wird "delay" verwendet
     container = db.relationship("Container", back_populates="group_assocs")
     group = db.relationship("Group", back_populates="group_containers")
 
 # ---------------------------
 # Models
 # ---------------------------
+class DockerHost(db.Model):
+    __tablename__ = 'docker_host'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)    # Anzeigename (z.B. "nas")
+    url = db.Column(db.String(200), nullable=False)                 # z.B. "tcp://10.0.0.5:2375" oder "unix:///run/nas.sock"
+    timeout = db.Column(db.Float, nullable=True)                    # Sekunden pro Docker-Call (leer = DOCKER_TIMEOUT)
+
 class Container(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)  # Internal name
     display_name = db.Column(db.String(100), nullable=False)        # Display name (z.B. "Nextcloud")
     docker_name = db.Column(db.String(100), nullable=False)         # Actual Docker container name
+    docker_id = db.Column(db.String(64), nullable=True, index=True)  # Docker container ID (vom Reconciler gepflegt)
     icon = db.Column(db.String(200), nullable=True)                 # z.B. "icons/filename.png"
     order_index = db.Column(db.Integer, default=0)                  # Ordering for standalone containers
+    idle_timeout = db.Column(db.Integer, nullable=True)             # Minuten ohne Aktivität bis zum Stoppen (leer = nie)
+    host_id = db.Column(db.Integer, db.ForeignKey('docker_host.id'), nullable=True, index=True)  # leer = lokaler Daemon
     group_assocs = db.relationship("GroupContainer", back_populates="container", cascade="all, delete-orphan", lazy='joined')
 
 class Group(db.Model):
@@ -58,195 +1514,2418 @@ class Group(db.Model):
     name = db.Column(db.String(50), unique=True, nullable=False)    # Group name
     icon = db.Column(db.String(200), nullable=True)                 # Group icon
     order_index = db.Column(db.Integer, default=0)                  # Ordering for groups
+    idle_timeout = db.Column(db.Integer, nullable=True)             # Minuten ohne Aktivität aller Mitglieder (leer = nie)
     group_containers = db.relationship("GroupContainer", back_populates="group", cascade="all, delete-orphan", lazy='joined')
 
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
-    role = db.Column(db.String(10), nullable=False, default='user')   # "admin" oder "user"
-    containers = db.relationship("Container", secondary="user_container", backref="users")
-    api_key = db.Column(db.String(128), nullable=True)  # Benutzer-spezifischer API-Key
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128), nullable=False)
+    role = db.Column(db.String(10), nullable=False, default='user')   # "admin" oder "user"
+    containers = db.relationship("Container", secondary="user_container", backref="users")
+    api_key = db.Column(db.String(128), nullable=True)  # Benutzer-spezifischer API-Key (nur noch alte Klartext-Keys)
+    api_key_id = db.Column(db.String(16), nullable=True, index=True)      # öffentlicher Teil des API-Keys ("id.secret")
+    api_key_hash = db.Column(db.String(64), nullable=True, index=True)    # SHA-256 des API-Keys
+
+# Protokoll aller Start/Stop-Aktionen, ein Eintrag pro Container (nur angehängt, nie geändert).
+# Benutzer und Container ohne Fremdschlüssel, damit Einträge ihr Löschen überdauern.
+class AuditEntry(db.Model):
+    __tablename__ = 'audit_entry'
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.Float, nullable=False, index=True)   # Unix-Zeit des Aktionsbeginns
+    user_id = db.Column(db.Integer, nullable=True)                 # leer = System (z.B. Idle-Stopp)
+    username = db.Column(db.String(80), nullable=True)
+    source = db.Column(db.String(10), nullable=False)              # "ui", "api" oder "idle"
+    action = db.Column(db.String(10), nullable=False)
+    target_type = db.Column(db.String(10), nullable=False)         # "container" oder "group"
+    target_id = db.Column(db.Integer, nullable=True)
+    target_name = db.Column(db.String(100), nullable=True)
+    container_id = db.Column(db.Integer, nullable=True)
+    container_name = db.Column(db.String(100), nullable=True)      # Docker-Name
+    outcome = db.Column(db.String(12), nullable=False)             # done, skipped, merged, superseded, error
+    error = db.Column(db.String(500), nullable=True)
+    duration = db.Column(db.Float, nullable=True)                  # Sekunden inkl. Bereitschaftsprüfung
+    # Blättern pro Benutzer bzw. Container (neueste zuerst) ohne Tabellenscan
+    __table_args__ = (db.Index('ix_audit_entry_user', 'user_id', 'id'),
+                      db.Index('ix_audit_entry_container', 'container_id', 'id'))
+
+user_container = db.Table('user_container',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('container_id', db.Integer, db.ForeignKey('container.id'), primary_key=True)
+)
+
+# ---------------------------
+# Flask-Login configuration
+# ---------------------------
+login_manager = LoginManager(app)
+login_manager.login_view = 'login_view'
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
+
+# ---------------------------
+# Config snapshot
+# ---------------------------
+# Unveränderlicher Stand von Containern, Gruppen und Benutzerrechten im Speicher.
+# Wird nur neu aufgebaut, wenn ein Commit diese Tabellen ändert; Sichtbarkeit und
+# ACL-Prüfungen sind damit Mengenoperationen ohne SQL.
+ContainerInfo = namedtuple('ContainerInfo', 'id name display_name docker_name docker_id icon order_index group_ids idle_timeout host_id')
+GroupMember = namedtuple('GroupMember', 'container startup_order delay ready_check ready_target ready_timeout')
+GroupInfo = namedtuple('GroupInfo', 'id name icon order_index group_containers member_ids idle_timeout')
+
+class ConfigSnapshot:
+    def __init__(self, version):
+        self.version = version
+        rows = db.session.execute(user_container.select()).all()
+        self.user_containers = {}
+        for user_id, container_id in rows:
+            self.user_containers.setdefault(user_id, set()).add(container_id)
+        self.user_containers = {uid: frozenset(ids) for uid, ids in self.user_containers.items()}
+        self.user_roles = dict(db.session.query(User.id, User.role).all())
+
+        self.containers = {}
+        for c in Container.query.order_by(Container.order_index).all():
+            self.containers[c.id] = ContainerInfo(c.id, c.name, c.display_name, c.docker_name, c.docker_id, c.icon,
+                                                  c.order_index, frozenset(gc.group_id for gc in c.group_assocs),
+                                                  c.idle_timeout, c.host_id)
+        self.hosts = {h.id: HostInfo(h.id, h.name, h.url, h.timeout) for h in DockerHost.query.all()}
+        self.groups = {}
+        for grp in Group.query.order_by(Group.order_index).all():
+            members = tuple(
+                GroupMember(self.containers[gc.container_id], gc.startup_order or 0, gc.delay or 0,
+                            gc.ready_check, gc.ready_target, gc.ready_timeout)
+                for gc in sorted(grp.group_containers, key=lambda x: x.startup_order or 0)
+            )
+            self.groups[grp.id] = GroupInfo(grp.id, grp.name, grp.icon, grp.order_index, members,
+                                          frozenset(m.container.id for m in members), grp.idle_timeout)
+        self._layouts = {}   # user id -> Dashboard-Layout
+        self._api_views = {} # erlaubte IDs -> (Container, Gruppen)
+
+    def allowed_ids(self, user_id):
+        return self.user_containers.get(user_id, frozenset())
+
+    # Dashboard: Admins sehen alles, andere Benutzer ihre Container und alle Gruppen,
+    # deren Container sie vollständig besitzen (diese Container stehen dann nicht einzeln)
+    def dashboard_layout(self, user_id):
+        layout = self._layouts.get(user_id)
+        if layout is None:
+            if self.user_roles.get(user_id) == 'admin':
+                individual = [c for c in self.containers.values() if not c.group_ids]
+                groups = list(self.groups.values())
+            else:
+                allowed = self.allowed_ids(user_id)
+                groups = [g for g in self.groups.values() if g.member_ids and g.member_ids <= allowed]
+                in_groups = frozenset().union(*(g.member_ids for g in groups))
+                individual = [self.containers[cid] for cid in sorted(allowed - in_groups,
+                              key=lambda cid: self.containers[cid].order_index) if cid in self.containers]
+            layout = (individual, groups)
+            self._layouts[user_id] = layout
+        return layout
+
+    # API: alle erlaubten Container und alle Gruppen, deren Container vollständig erlaubt sind
+    def api_view(self, allowed):
+        view = self._api_views.get(allowed)
+        if view is None:
+            containers = [c for c in self.containers.values() if c.id in allowed]
+            groups = [g for g in self.groups.values() if g.member_ids <= allowed]
+            view = (containers, groups)
+            self._api_views[allowed] = view
+        return view
+
+# Mehrere Worker-Prozesse: Änderungen werden über die mtime einer Marker-Datei im
+# data-Ordner signalisiert, die jeder Worker höchstens alle CONFIG_SYNC_INTERVAL Sekunden prüft.
+CONFIG_SYNC_INTERVAL = float(os.environ.get('CONFIG_SYNC_INTERVAL', 1))
+CONFIG_VERSION_FILE = os.path.join(DATA_DIR, '.config_version')
+
+class ConfigStore:
+    def __init__(self, version_file=CONFIG_VERSION_FILE):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self.version_file = version_file
+        self._marker = self._read_marker()
+        self._checked_at = time.monotonic()
+
+    def _read_marker(self):
+        try:
+            return os.stat(self.version_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_marker(self):
+        now = time.monotonic()
+        if now - self._checked_at < CONFIG_SYNC_INTERVAL:
+            return
+        self._checked_at = now
+        marker = self._read_marker()
+        if marker != self._marker:
+            self._marker = marker
+            self._drop()
+
+    def get(self):
+        self._check_marker()
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._version += 1
+                    snapshot = ConfigSnapshot(self._version)
+                    docker_hosts.configure(snapshot.hosts)
+                    self._snapshot = snapshot
+                snapshot = self._snapshot
+        return snapshot
+
+    def _drop(self):
+        with self._lock:
+            self._snapshot = None
+        api_auth_cache.invalidate()
+
+    def invalidate(self):
+        self._drop()
+        # Andere Worker-Prozesse informieren
+        try:
+            os.makedirs(os.path.dirname(self.version_file), exist_ok=True)
+            tmp_file = f'{self.version_file}.{os.getpid()}'
+            with open(tmp_file, 'w') as f:
+                f.write(str(time.time_ns()))
+            os.replace(tmp_file, self.version_file)
+            self._marker = self._read_marker()
+        except OSError as e:
+            app.logger.warning("Could not update config version marker: %s", e)
+
+config_store = ConfigStore()
+
+CONFIG_MODELS = (DockerHost, Container, Group, GroupContainer, User)
+
+# Jeder Commit, der Container, Gruppen oder Benutzer ändert, verwirft den Snapshot
+@event.listens_for(db.session, 'before_flush')
+def _mark_config_dirty(session, flush_context, instances):
+    if any(isinstance(obj, CONFIG_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['config_dirty'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_config(session):
+    if session.info.pop('config_dirty', False):
+        config_store.invalidate()
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# ---------------------------
+# Label discovery & reconciliation
+# ---------------------------
+# Container mit Labels "docker-controller.*" werden automatisch angelegt (samt Gruppe,
+# Reihenfolge und Verzögerung). Zu jeder Container-Zeile wird die Docker-ID mitgeführt:
+# Umbenennungen (gleiche ID) und Neuerstellungen (gleicher Name, neue ID) werden aus dem
+# Events-Stream nachgezogen. Änderungen werden kurz gesammelt und in einer Transaktion
+# geschrieben; mit mehreren Gunicorn-Workern schreibt nur der Inhaber der Lock-Datei.
+LABEL_PREFIX = 'docker-controller.'
+LABEL_DISCOVERY = os.environ.get('LABEL_DISCOVERY', '1') == '1'
+RECONCILE_BATCH_DELAY = 1.0    # Sekunden, in denen Änderungen gesammelt werden
+RECONCILE_LOCK_FILE = os.path.join(DATA_DIR, '.reconciler.lock')
+# Docker Compose benennt den alten Container beim Neuerstellen kurz in "<id>_<name>" um
+COMPOSE_TEMP_NAME = re.compile(r'^[0-9a-f]{12}_')
+
+def label_int(labels, key):
+    try:
+        return int(labels.get(LABEL_PREFIX + key) or 0)
+    except ValueError:
+        return 0
+
+# Exklusiver, nicht blockierender Lock auf eine Datei; gibt den Deskriptor oder None zurück.
+# Der Lock hält, solange der Prozess lebt (Leader-Wahl zwischen Gunicorn-Workern).
+def try_lock_file(path):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+class ContainerReconciler:
+    def __init__(self, lock_file=RECONCILE_LOCK_FILE):
+        self.lock_file = lock_file
+        self._lock_fd = None
+        self._pending = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _is_leader(self):
+        if self._lock_fd is None:
+            self._lock_fd = try_lock_file(self.lock_file)
+        return self._lock_fd is not None
+
+    @staticmethod
+    def _entries(listing, host_id=None):
+        return [{'id': c['Id'], 'name': c['Names'][0].lstrip('/') if c.get('Names') else c['Id'][:12],
+                 'labels': c.get('Labels') or {}, 'importable': True, 'host_id': host_id} for c in listing]
+
+    # Listener der Status-Caches (aller Hosts): vollständige Liste nach jedem Resync ...
+    def on_resync(self, listing, host_id=None):
+        self._submit(self._entries(listing, host_id))
+
+    # ... und einzelne create/rename-Events
+    def on_event(self, action, cont_id, attrs, host_id=None):
+        if attrs.get('name'):
+            labels = {k: v for k, v in attrs.items() if k.startswith(LABEL_PREFIX)}
+            self._submit([{'id': cont_id, 'name': attrs['name'].lstrip('/'), 'labels': labels,
+                           'importable': action == 'create', 'host_id': host_id}])
+
+    def _submit(self, entries):
+        if not self._is_leader():
+            return
+        self._pending.put(entries)
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='reconciler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            entries = list(self._pending.get())
+            time.sleep(RECONCILE_BATCH_DELAY)
+            while True:
+                try:
+                    entries.extend(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with app.app_context():
+                    self.apply(entries)
+            except Exception:
+                app.logger.exception("Container reconciliation failed")
+
+    # Zuordnung je Host: gleiche Namen auf verschiedenen Hosts sind verschiedene Container
+    def apply(self, entries):
+        rows = Container.query.all()
+        by_id = {(row.host_id, row.docker_id): row for row in rows if row.docker_id}
+        by_name = {(row.host_id, row.docker_name): row for row in rows}
+        names = {row.name for row in rows}
+        groups = {group.name: group for group in Group.query.all()}
+        counts = Counter()
+        for entry in entries:
+            if COMPOSE_TEMP_NAME.match(entry['name']):
+                continue
+            host_id = entry.get('host_id')
+            row = by_id.get((host_id, entry['id']))
+            if row is not None:
+                if row.docker_name != entry['name']:
+                    app.logger.info("Container %s was renamed to %s", row.docker_name, entry['name'])
+                    by_name.pop((host_id, row.docker_name), None)
+                    row.docker_name = entry['name']
+                    by_name[(host_id, row.docker_name)] = row
+                    counts['renamed'] += 1
+                continue
+            row = by_name.get((host_id, entry['name']))
+            if row is not None:
+                # Neu erstellt (gleicher Name, neue ID) oder ID bisher unbekannt
+                by_id.pop((host_id, row.docker_id), None)
+                row.docker_id = entry['id']
+                by_id[(host_id, row.docker_id)] = row
+                counts['linked'] += 1
+                continue
+            labels = entry['labels']
+            if (not LABEL_DISCOVERY or not entry['importable'] or not any(k.startswith(LABEL_PREFIX) for k in labels)
+                    or labels.get(LABEL_PREFIX + 'enable', 'true').lower() == 'false'):
+                continue
+            row = self._import(entry, names, groups)
+            by_id[(host_id, row.docker_id)] = row
+            by_name[(host_id, row.docker_name)] = row
+            counts['imported'] += 1
+        if counts:
+            db.session.commit()
+            app.logger.info("Reconciled containers: %s", ", ".join(f"{n} {k}" for k, n in sorted(counts.items())))
+
+    @staticmethod
+    def _import(entry, names, groups):
+        labels = entry['labels']
+        name = entry['name'][:50]
+        if name in names:
+            name = f"{name[:41]}-{entry['id'][:8]}"
+        names.add(name)
+        row = Container(name=name, display_name=labels.get(LABEL_PREFIX + 'display_name') or entry['name'],
+                        docker_name=entry['name'], docker_id=entry['id'], order_index=label_int(labels, 'order'),
+                        idle_timeout=label_int(labels, 'idle_timeout') or None, host_id=entry.get('host_id'))
+        db.session.add(row)
+        group_name = labels.get(LABEL_PREFIX + 'group')
+        if group_name:
+            group = groups.get(group_name)
+            if group is None:
+                group = groups[group_name] = Group(name=group_name[:50])
+                db.session.add(group)
+            group.group_containers.append(GroupContainer(container=row, startup_order=label_int(labels, 'order'),
+                                                         delay=label_int(labels, 'delay')))
+        return row
+
+container_reconciler = ContainerReconciler()
+docker_hosts.listeners.append(container_reconciler)
+
+# ---------------------------
+# Resource stats
+# ---------------------------
+# Ein Hintergrund-Sampler fragt im festen Intervall die Stats aller laufenden, registrierten
+# Container ab (one-shot, begrenzte Parallelität). Pro Container gibt es Ringpuffer fester
+# Größe in flachen array('d'): Rohwerte sowie Minuten- und Stunden-Mittelwerte. Leser
+# (Dashboard, /api/stats) bedienen sich nur aus dem Speicher. Mit mehreren Workern sampelt nur
+# der Inhaber der Lock-Datei; die anderen übernehmen jede Runde aus einer kleinen Datei.
+STATS_INTERVAL = float(os.environ.get('STATS_INTERVAL', 10))        # Sekunden zwischen Runden, 0 = aus
+STATS_CONCURRENCY = int(os.environ.get('STATS_CONCURRENCY', 4))     # gleichzeitige Stats-Abfragen
+STATS_HISTORY = int(os.environ.get('STATS_HISTORY', 360))           # Rohwerte pro Container
+STATS_MINUTES = 24 * 60                                             # 1m-Mittelwerte (24 h)
+STATS_HOURS = 7 * 24                                                # 1h-Mittelwerte (7 Tage)
+STATS_LOCK_FILE = os.path.join(DATA_DIR, '.stats.lock')
+STATS_ROUND_FILE = os.path.join(DATA_DIR, '.stats_round.json')
+# Spalte 0 ist der Zeitstempel; Raten in Bytes pro Sekunde
+STATS_FIELDS = ('time', 'cpu_percent', 'memory_bytes', 'memory_limit',
+                'net_rx_rate', 'net_tx_rate', 'block_read_rate', 'block_write_rate')
+STATS_WIDTH = len(STATS_FIELDS)
+NAN = float('nan')
+
+STATS_ROUND_LATENCY = metric('stats_sample_round_duration_seconds', 'Duration of one resource stats sampling round.', 'histogram').labels()
+
+class StatsRing:
+    def __init__(self, size, step=0):
+        self.size = size
+        self.step = step          # > 0: Mittelwerte über Intervalle dieser Länge (Sekunden)
+        self.values = array('d', [NAN]) * (size * STATS_WIDTH)
+        self.next = 0
+        self.count = 0
+        self._bucket = None
+        self._sums = [0.0] * STATS_WIDTH
+        self._counts = [0] * STATS_WIDTH
+
+    def append(self, row):
+        pos = self.next * STATS_WIDTH
+        self.values[pos:pos + STATS_WIDTH] = array('d', row)
+        self.next = (self.next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    # Rollup: Werte des laufenden Intervalls aufsummieren, beim Wechsel den Mittelwert ablegen
+    def add(self, row):
+        bucket = int(row[0] // self.step)
+        if self._bucket is not None and bucket != self._bucket:
+            self.append([self._bucket * self.step] + [s / n if n else NAN for s, n in
+                                                      zip(self._sums[1:], self._counts[1:])])
+            self._sums = [0.0] * STATS_WIDTH
+            self._counts = [0] * STATS_WIDTH
+        self._bucket = bucket
+        for i in range(1, STATS_WIDTH):
+            if row[i] == row[i]:   # NaN (unbekannt) überspringen
+                self._sums[i] += row[i]
+                self._counts[i] += 1
+
+    def last(self):
+        if not self.count:
+            return None
+        pos = (self.next - 1) % self.size * STATS_WIDTH
+        return self.values[pos:pos + STATS_WIDTH]
+
+    # Zeilen (älteste zuerst) ab Zeitstempel "since"
+    def rows(self, since=0):
+        start = (self.next - self.count) % self.size
+        rows = []
+        for i in range(self.count):
+            pos = (start + i) % self.size * STATS_WIDTH
+            if self.values[pos] >= since:
+                rows.append(self.values[pos:pos + STATS_WIDTH])
+        return rows
+
+class ContainerStatsSeries:
+    __slots__ = ('rings', 'counters')
+
+    def __init__(self, history=STATS_HISTORY):
+        self.rings = {'raw': StatsRing(history), '1m': StatsRing(STATS_MINUTES, 60), '1h': StatsRing(STATS_HOURS, 3600)}
+        self.counters = None   # letzte kumulative Zähler (nur im sampelnden Prozess)
+
+    def add(self, row):
+        self.rings['raw'].append(row)
+        self.rings['1m'].add(row)
+        self.rings['1h'].add(row)
+
+def stats_value(value):
+    return None if value != value else round(value, 3)
+
+def stats_row(row):
+    return dict(zip(STATS_FIELDS, (stats_value(v) for v in row)))
+
+# Rohantwort von /containers/<id>/stats -> Zeile nach STATS_FIELDS. CPU und Raten brauchen die
+# Zähler der vorherigen Runde (bei one-shot fehlen die precpu_stats).
+def parse_container_stats(raw, now, series):
+    cpu = raw.get('cpu_stats') or {}
+    cpu_total = (cpu.get('cpu_usage') or {}).get('total_usage')
+    system = cpu.get('system_cpu_usage')
+    online = cpu.get('online_cpus') or len((cpu.get('cpu_usage') or {}).get('percpu_usage') or ()) or 1
+    memory = raw.get('memory_stats') or {}
+    usage = memory.get('usage')
+    if usage is not None:
+        # Wie "docker stats": Page-Cache nicht mitzählen (cgroup v2: inactive_file, v1: cache)
+        mem_stats = memory.get('stats') or {}
+        usage -= mem_stats.get('inactive_file', mem_stats.get('total_inactive_file', mem_stats.get('cache', 0)))
+    networks = (raw.get('networks') or {}).values()
+    io_bytes = (raw.get('blkio_stats') or {}).get('io_service_bytes_recursive') or ()
+    counters = {
+        'time': now,
+        'cpu': cpu_total,
+        'system': system,
+        'rx': sum(n.get('rx_bytes', 0) for n in networks),
+        'tx': sum(n.get('tx_bytes', 0) for n in networks),
+        'read': sum(e.get('value', 0) for e in io_bytes if (e.get('op') or '').lower() == 'read'),
+        'write': sum(e.get('value', 0) for e in io_bytes if (e.get('op') or '').lower() == 'write'),
+    }
+    prev = series.counters
+    precpu = raw.get('precpu_stats') or {}
+    if precpu.get('system_cpu_usage'):
+        prev_cpu, prev_system = (precpu.get('cpu_usage') or {}).get('total_usage'), precpu['system_cpu_usage']
+    elif prev:
+        prev_cpu, prev_system = prev['cpu'], prev['system']
+    else:
+        prev_cpu = prev_system = None
+    cpu_percent = NAN
+    if None not in (cpu_total, system, prev_cpu, prev_system) and system > prev_system:
+        cpu_percent = max(0.0, (cpu_total - prev_cpu) / (system - prev_system) * online * 100)
+
+    def rate(key):
+        if not prev or now <= prev['time'] or counters[key] < prev[key]:
+            return NAN
+        return (counters[key] - prev[key]) / (now - prev['time'])
+    series.counters = counters
+    return [now, cpu_percent, NAN if usage is None else float(usage), float(memory.get('limit') or NAN),
+            rate('rx'), rate('tx'), rate('read'), rate('write')]
+
+class StatsSampler:
+    def __init__(self, client, interval=STATS_INTERVAL, concurrency=STATS_CONCURRENCY,
+                 lock_file=STATS_LOCK_FILE, round_file=STATS_ROUND_FILE):
+        self.client = client
+        self.interval = interval
+        self.concurrency = concurrency
+        self.lock_file = lock_file
+        self.round_file = round_file
+        self._lock = threading.Lock()
+        self._series = {}      # Container-ID (DB) -> ContainerStatsSeries
+        self._round = 0        # zuletzt übernommene Runde
+        self._lock_fd = None
+        self._thread = None
+        self.listeners = []    # erhalten nach jeder eigenen Runde (Snapshot, gesampelte IDs, Zeit)
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def start(self):
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='stats-sampler', daemon=True)
+            self._thread.start()
+
+    def reset(self):
+        # Nach fork(): Thread und Lock des Elternprozesses gelten nicht für den Worker
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._thread = None
+
+    def _is_leader(self):
+        if self._lock_fd is None:
+            self._lock_fd = try_lock_file(self.lock_file)
+        return self._lock_fd is not None
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                if self._is_leader():
+                    self.sample()
+                else:
+                    self.follow()
+            except Exception:
+                app.logger.exception("Resource stats sampling failed")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def sample(self):
+        with app.app_context():
+            snapshot = config_store.get()
+            db.session.remove()
+        containers = list(snapshot.containers.values())
+        # Nur laufende Container: gestoppte liefern keine sinnvollen Werte
+        running = []
+        for c in containers:
+            cache = docker_hosts.get(c.host_id).status_cache
+            if (cache.cached(c.docker_name, c.docker_id) or cache.last_known(c.docker_name, c.docker_id)) in ('running', 'unknown'):
+                running.append(c)
+        started = time.perf_counter()
+        results = self.client.run(self._fetch(running))
+        STATS_ROUND_LATENCY.observe(time.perf_counter() - started)
+        now = time.time()
+        rows = {}
+        with self._lock:
+            known = {c.id for c in containers}
+            for cont_id in list(self._series):
+                if cont_id not in known:
+                    del self._series[cont_id]
+            for cont_id, raw in results:
+                if raw is None:
+                    continue
+                series = self._series.get(cont_id)
+                if series is None:
+                    series = self._series[cont_id] = ContainerStatsSeries()
+                rows[cont_id] = parse_container_stats(raw, now, series)
+                series.add(rows[cont_id])
+            self._round += 1
+            round_no = self._round
+        self._publish(round_no, rows)
+        for listener in self.listeners:
+            listener.on_stats_round(snapshot, set(rows), now)
+
+    async def _fetch(self, containers):
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def one(cont):
+            async with limit:
+                try:
+                    api = docker_hosts.get(cont.host_id).api
+                    return cont.id, await api.stats(cont.docker_id or cont.docker_name)
+                except docker.errors.APIError:
+                    return cont.id, None
+        return await asyncio.gather(*(one(cont) for cont in containers))
+
+    # Andere Worker lesen die Runde aus der Datei, statt selbst den Daemon zu fragen
+    def _publish(self, round_no, rows):
+        try:
+            os.makedirs(os.path.dirname(self.round_file), exist_ok=True)
+            tmp_file = f'{self.round_file}.{os.getpid()}'
+            with open(tmp_file, 'w') as f:
+                json.dump({'round': round_no, 'rows': {str(cid): [stats_value(v) for v in row]
+                                                       for cid, row in rows.items()}}, f)
+            os.replace(tmp_file, self.round_file)
+        except OSError as e:
+            app.logger.warning("Could not write stats round file: %s", e)
+
+    def follow(self):
+        try:
+            with open(self.round_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            # Rundennummer des Sampelnden übernehmen, damit ein späterer Wechsel nahtlos anschließt
+            if data['round'] == self._round:
+                return
+            self._round = data['round']
+            for cont_id, row in data['rows'].items():
+                series = self._series.get(int(cont_id))
+                if series is None:
+                    series = self._series[int(cont_id)] = ContainerStatsSeries()
+                series.add([NAN if v is None else v for v in row])
+
+    # Letzter Wert, sofern er nicht älter als zwei Intervalle ist (sonst läuft der Container nicht)
+    def current(self, cont_id):
+        with self._lock:
+            series = self._series.get(cont_id)
+            row = series.rings['raw'].last() if series else None
+        if row is None or time.time() - row[0] > 2 * self.interval + DOCKER_TIMEOUT:
+            return None
+        return stats_row(row)
+
+    def history(self, cont_id, resolution, since=0):
+        with self._lock:
+            series = self._series.get(cont_id)
+            rows = series.rings[resolution].rows(since) if series else []
+        return [[stats_value(v) for v in row] for row in rows]
+
+stats_sampler = StatsSampler(docker_async)
+
+# Der Sampler läuft ab dem ersten Request im Worker-Prozess (nicht im Gunicorn-Master vor dem fork)
+@app.before_request
+def _start_stats_sampler():
+    stats_sampler.start()
+
+# ---------------------------
+# Forms
+# ---------------------------
+class ContainerForm(FlaskForm):
+    name = StringField('Internal Name', validators=[DataRequired()])
+    display_name = StringField('Display Name', validators=[DataRequired()])
+    docker_name = StringField('Docker Container Name', validators=[DataRequired()])
+    host_id = SelectField('Docker Host', coerce=int, default=0)    # 0 = lokaler Daemon
+    icon = FileField('Icon (optional)', validators=[FileAllowed(['jpg','jpeg','png','gif'], 'Only image files allowed')])
+    idle_timeout = IntegerField('Stop when idle for (minutes, optional)', validators=[Optional(), NumberRange(min=1)])
+    submit = SubmitField('Save')
+
+# Hier wird das Container-Feld als Checkbox-Liste dargestellt
+class GroupForm(FlaskForm):
+    name = StringField('Group Name', validators=[DataRequired()])
+    icon = FileField('Group Icon (optional)', validators=[FileAllowed(['jpg','jpeg','png','gif'], 'Only image files allowed')])
+    containers = SelectMultipleField('Containers', coerce=int, widget=widgets.ListWidget(prefix_label=False), option_widget=widgets.CheckboxInput())
+    idle_timeout = IntegerField('Stop when all containers are idle for (minutes, optional)', validators=[Optional(), NumberRange(min=1)])
+    submit = SubmitField('Create Group')
+
+# Login-Formular
+class LoginForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired()])
+    submit = SubmitField('Login')
+
+# Hier auch Checkboxen für die Container-Auswahl (benutzerverwaltung)
+class UserForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password')
+    role = StringField('Role (admin/user)', validators=[DataRequired()])
+    containers = SelectMultipleField('Accessible Containers', coerce=int, widget=widgets.ListWidget(prefix_label=False), option_widget=widgets.CheckboxInput())
+    submit = SubmitField('Save')
+
+class DockerHostForm(FlaskForm):
+    name = StringField('Name', validators=[DataRequired()])
+    url = StringField('URL (unix:///path/docker.sock or tcp://host:2375)', validators=[DataRequired()])
+    timeout = FloatField('Timeout in seconds (optional)', validators=[Optional(), NumberRange(min=0.1)])
+    submit = SubmitField('Add Host')
+
+class ContainerOrderForm(FlaskForm):
+    submit = SubmitField('Save')
+
+class GroupOrderForm(FlaskForm):
+    submit = SubmitField('Save')
+
+# ---------------------------
+# Group orchestration
+# ---------------------------
+# Container mit gleicher startup_order bilden eine Stufe und werden parallel gestartet.
+# Die nächste Stufe startet erst, wenn die vorherige bereit ist (Bereitschaftsprüfung,
+# sonst GroupContainer.delay als Mindestabstand). Gestoppt wird in umgekehrter Reihenfolge.
+GROUP_PARALLELISM = int(os.environ.get('GROUP_PARALLELISM', 4))      # max. gleichzeitige Aktionen pro Stufe
+GROUP_STOP_TIMEOUT = int(os.environ.get('GROUP_STOP_TIMEOUT', 10))   # Sekunden bis SIGKILL beim Stoppen
+
+# Liest die Gruppe einmal aus der DB, damit die Worker-Threads keine ORM-Objekte anfassen
+def build_group_plan(group):
+    tiers = {}
+    for gc in group.group_containers:
+        tiers.setdefault(gc.startup_order or 0, []).append({
+            'container_id': gc.container.id,
+            'docker_name': gc.container.docker_name,
+            'docker_id': gc.container.docker_id,
+            'host_id': gc.container.host_id,
+            'delay': gc.delay or 0,
+            'ready_check': gc.ready_check,
+            'ready_target': gc.ready_target,
+            'ready_timeout': gc.ready_timeout or READY_DEFAULT_TIMEOUT,
+        })
+    return [tiers[order] for order in sorted(tiers)]
+
+# Plan für einen einzelnen Container (eine Stufe ohne Wartezeit)
+def container_plan(cont):
+    return [[{'container_id': cont.id, 'docker_name': cont.docker_name, 'docker_id': cont.docker_id,
+              'host_id': cont.host_id, 'delay': 0}]]
+
+# Start/Stop sind idempotent und werden pro Container (Host + Name) koordiniert:
+# - Ist der Container schon im Zielzustand, entfällt der Daemon-Call ("skipped").
+# - Läuft bzw. wartet bereits dieselbe Aktion, wird darauf gewartet statt sie zu wiederholen ("merged").
+# - Gegensätzliche Aktionen laufen nacheinander; von mehreren wartenden gewinnt die zuletzt
+#   angeforderte, die übrigen entfallen ("superseded"). Start/Stop-Stürme enden so nach
+#   höchstens zwei Daemon-Aktionen im zuletzt gewünschten Zustand.
+CONTROL_TARGET_STATES = {'start': ('running',), 'stop': ('exited', 'created', 'dead')}
+CONTROL_OUTCOMES = metric('control_actions_total', 'Container start/stop requests by outcome.', 'counter', ('action', 'outcome'))
+
+class ControlCoordinator:
+    def __init__(self):
+        self._latest = {}   # (host_id, docker_name) -> zuletzt eingeplante Aktion (nur im Docker-Loop)
+
+    async def run(self, key, action, execute):
+        latest = self._latest.get(key)
+        if latest is not None and latest['action'] == action:
+            outcome, info = await asyncio.shield(latest['task'])
+            if outcome == 'done':
+                outcome = 'merged'
+        else:
+            if latest is not None and not latest['started']:
+                latest['superseded'] = True
+            flight = {'action': action, 'started': False, 'superseded': False}
+            flight['task'] = asyncio.ensure_future(self._execute(key, flight, execute, latest))
+            self._latest[key] = flight
+            outcome, info = await asyncio.shield(flight['task'])
+        CONTROL_OUTCOMES.labels(action, outcome).inc()
+        return outcome, info
+
+    async def _execute(self, key, flight, execute, previous):
+        try:
+            if previous is not None:
+                # Erst nach der vorherigen Aktion, unabhängig von deren Ergebnis
+                await asyncio.wait([previous['task']])
+            if flight['superseded']:
+                return 'superseded', None
+            flight['started'] = True
+            return await execute()
+        finally:
+            if self._latest.get(key) is flight:
+                del self._latest[key]
+
+    def reset(self):
+        self._latest = {}
+
+control_coordinator = ControlCoordinator()
+
+# Jeder Call geht an den Host des Containers (eigener Timeout und Circuit Breaker).
+# Gibt (outcome, inspect-Daten) zurück; ohne Daemon-Call ("skipped"/"superseded") evtl. ohne Daten.
+async def control_container(docker_name, action, stop_timeout=GROUP_STOP_TIMEOUT, host_id=None, docker_id=None):
+    backend = docker_hosts.get(host_id)
+
+    async def execute():
+        # Der Cache folgt dem Events-Stream: steht der Zielzustand dort, ist kein Call nötig.
+        # Bekannte ID zuerst, damit ein anderer Container unter demselben Namen nicht zählt.
+        if backend.status_cache.cached(docker_name, docker_id) in CONTROL_TARGET_STATES[action]:
+            return 'skipped', None
+        info = None
+        if docker_id:
+            try:
+                info = await backend.api.inspect(docker_id)
+            except docker.errors.NotFound:
+                pass   # neu erstellt: ab hier gilt der Name (der Reconciler übernimmt die neue ID)
+        if info is None:
+            info = await backend.api.inspect(docker_name)
+        if info['State']['Status'] in CONTROL_TARGET_STATES[action]:
+            backend.status_cache.set(info['Id'], info['Name'].lstrip('/'), info['State']['Status'])
+            return 'skipped', info
+        if action == "start":
+            await backend.api.start(info['Id'])
+        else:
+            await backend.api.stop(info['Id'], stop_timeout)
+        mark_container_status(info['Id'], info['Name'].lstrip('/'), action, host_id)
+        return 'done', info
+    return await control_coordinator.run((host_id, docker_name), action, execute)
+
+# ---------------------------
+# Readiness checks
+# ---------------------------
+# Jede Prüfung gibt True (bereit), False (noch nicht bereit) oder None (nicht auswertbar,
+# z.B. Image ohne HEALTHCHECK) zurück. Bei None bzw. Timeout gilt wieder "delay".
+READY_DEFAULT_TIMEOUT = 60
+READY_POLL_INTERVAL = 0.5
+READY_CHECKS = ('healthy', 'tcp', 'log')
+
+async def check_healthy(info, member, state):
+    info = await docker_hosts.get(member.get('host_id')).api.inspect(info['Id'])
+    health = info.get('State', {}).get('Health')
+    if not health:
+        return None
+    return health.get('Status') == 'healthy'
+
+async def check_tcp(info, member, state):
+    target = (member['ready_target'] or '').strip()
+    host, _, port = target.rpartition(':')
+    if not port.isdigit():
+        return None
+    if not host:
+        # Nur ein Port angegeben: IP des Containers im ersten Netzwerk verwenden
+        if 'host' not in state:
+            info = await docker_hosts.get(member.get('host_id')).api.inspect(info['Id'])
+            networks = info.get('NetworkSettings', {}).get('Networks') or {}
+            state['host'] = next((n['IPAddress'] for n in networks.values() if n.get('IPAddress')), None)
+        host = state['host']
+        if not host:
+            return None
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), READY_POLL_INTERVAL)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+async def check_log(info, member, state):
+    if 'pattern' not in state:
+        try:
+            state['pattern'] = re.compile(member['ready_target'] or '')
+        except re.error:
+            return None
+        state['since'] = state['started']
+    # Nur die seit der letzten Abfrage neuen Zeilen lesen
+    until = time.time()
+    output = await docker_hosts.get(member.get('host_id')).api.logs(info['Id'], state['since'], until, tty=info.get('Config', {}).get('Tty'))
+    state['since'] = until
+    return any(state['pattern'].search(line) for line in output.decode('utf-8', 'replace').splitlines())
+
+READY_CHECK_FUNCS = {'healthy': check_healthy, 'tcp': check_tcp, 'log': check_log}
+
+# Wartet nach dem Start, bis der Container bereit ist. Gibt (ready, Wartezeit) zurück;
+# ready ist None, wenn keine (auswertbare) Prüfung konfiguriert ist und "delay" gilt.
+async def wait_until_ready(info, member, started, use_delay=True):
+    check = READY_CHECK_FUNCS.get(member.get('ready_check'))
+    ready = None
+    if check:
+        state = {'started': started}
+        deadline = time.monotonic() + member['ready_timeout']
+        while True:
+            try:
+                ready = await check(info, member, state)
+            except docker.errors.APIError:
+                ready = None
+            if ready is not False or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(READY_POLL_INTERVAL)
+    if not ready and use_delay and member['delay']:
+        # Fallback: feste Wartezeit ab dem Start
+        remaining = member['delay'] - (time.time() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+    return ready, round(time.time() - started, 3)
+
+async def control_member(member, action, stop_timeout=GROUP_STOP_TIMEOUT, progress=None, use_delay=True):
+    if progress:
+        progress(member, 'running')
+    result = {'error': None, 'ready': None, 'ready_wait': None, 'outcome': None}
+    try:
+        started = time.time()
+        result['outcome'], info = await control_container(member['docker_name'], action, stop_timeout,
+                                                          member.get('host_id'), member.get('docker_id'))
+        if action == "start" and result['outcome'] != 'superseded':
+            idle_manager.touch([member['container_id']])
+        # Lief der Container schon, ist er bereit; die nächste Stufe muss nicht warten
+        if action == "start" and result['outcome'] in ('done', 'merged'):
+            result['ready'], result['ready_wait'] = await wait_until_ready(info, member, started, use_delay)
+            if result['ready'] is False:
+                result['error'] = (f"Container {member['docker_name']} not ready after "
+                                   f"{member['ready_timeout']}s ({member['ready_check']})")
+    except docker.errors.NotFound:
+        result['error'] = f"Container {member['docker_name']} not found"
+    except docker.errors.APIError as e:
+        result['error'] = f"Container {member['docker_name']}: {e.explanation or e}"
+    if result['ready_wait'] is not None and member.get('ready_check'):
+        app.logger.info("Container %s ready=%s after %.1fs", member['docker_name'], result['ready'], result['ready_wait'])
+    if progress:
+        progress(member, 'error' if result['error'] else 'done', result)
+    return result
+
+# limit: optional gemeinsame Semaphore, wenn mehrere Pläne gleichzeitig laufen (Batch)
+# outcomes: optionales Dict, das {container_id: "done"/"skipped"/"merged"/"superseded"} erhält
+# audit: audit_context() des Auslösers; jeder Container landet dann im Audit-Log
+async def run_group_action_async(plan, action, parallelism=GROUP_PARALLELISM, stop_timeout=GROUP_STOP_TIMEOUT,
+                                 progress=None, limit=None, outcomes=None, audit=None):
+    errors = {}
+    tiers = plan if action == "start" else list(reversed(plan))
+    limit = limit or asyncio.Semaphore(max(1, parallelism))
+
+    async def limited(member, use_delay):
+        async with limit:
+            started = time.time()
+            result = await control_member(member, action, stop_timeout, progress, use_delay)
+            if audit is not None:
+                audit_log.record(audit, action, member, result, started, time.time() - started)
+            return result
+    for idx, tier in enumerate(tiers):
+        # Nach der letzten Stufe wartet niemand mehr, "delay" entfällt dort
+        use_delay = idx < len(tiers) - 1
+        results = await asyncio.gather(*(limited(member, use_delay) for member in tier))
+        for member, result in zip(tier, results):
+            if result['error']:
+                errors[member['container_id']] = result['error']
+            elif outcomes is not None:
+                outcomes[member['container_id']] = result['outcome']
+    return errors
+
+# Führt start/stop für einen Gruppenplan aus und gibt {container_id: Fehlermeldung} zurück.
+# progress(member, state, result=None) wird pro Container aufgerufen (z.B. für Jobs).
+# Jede Stufe ist erst fertig, wenn alle ihre Container bereit sind (Prüfung oder "delay").
+def run_group_action(plan, action, parallelism=GROUP_PARALLELISM, stop_timeout=GROUP_STOP_TIMEOUT, progress=None,
+                     outcomes=None, audit=None):
+    if not plan:
+        return {}
+    started = time.perf_counter()
+    errors = docker_async.run(run_group_action_async(plan, action, parallelism, stop_timeout, progress,
+                                                     outcomes=outcomes, audit=audit))
+    GROUP_ACTION_LATENCY.labels(action).observe(time.perf_counter() - started)
+    return errors
+
+# ---------------------------
+# Audit log
+# ---------------------------
+# Jede Start/Stop-Aktion wird pro Container protokolliert (wer, woher, Ziel, Ergebnis, Dauer).
+# Einträge landen zuerst in einer begrenzten Queue im Speicher; ein Hintergrund-Thread schreibt
+# sie gesammelt in einer Transaktion, damit keine SQLite-Schreibzugriffe im Request liegen.
+# Ist die Queue voll, werden Einträge verworfen (und gezählt) statt Requests zu blockieren.
+# Alte Einträge löscht der Inhaber der Lock-Datei in kleinen Portionen (kurze Sperren).
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))        # max. ungeschriebene Einträge
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1))   # Sekunden, in denen gesammelt wird
+AUDIT_BATCH_SIZE = 500                                                    # Einträge pro Transaktion
+AUDIT_RETENTION_DAYS = float(os.environ.get('AUDIT_RETENTION_DAYS', 90))  # 0 = unbegrenzt aufbewahren
+AUDIT_PRUNE_INTERVAL = 3600
+AUDIT_PRUNE_BATCH = 1000                                                  # gelöschte Zeilen pro Transaktion
+AUDIT_LOCK_FILE = os.path.join(DATA_DIR, '.audit.lock')
+
+AUDIT_DROPPED = metric('audit_entries_dropped_total', 'Audit entries dropped because the write queue was full.', 'counter').labels()
+AUDIT_FLUSH_LATENCY = metric('audit_flush_duration_seconds', 'Duration of one batched audit log write.', 'histogram').labels()
+
+# Wer eine Aktion ausgelöst hat und worauf sie zielt (Container oder Gruppe)
+def audit_context(user_id, username, source, target_type, target_id, target_name):
+    return {'user_id': user_id, 'username': username, 'source': source,
+            'target_type': target_type, 'target_id': target_id, 'target_name': target_name}
+
+class AuditLog:
+    def __init__(self, queue_size=AUDIT_QUEUE_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL,
+                 retention_days=AUDIT_RETENTION_DAYS, lock_file=AUDIT_LOCK_FILE):
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.lock_file = lock_file
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._thread = None
+        self._pruned_at = 0.0
+
+    # Ergebnis von control_member() für einen Container; blockiert nie
+    def record(self, context, action, member, result, started, duration):
+        entry = dict(context, created_at=started, action=action, container_id=member['container_id'],
+                     container_name=member['docker_name'], outcome='error' if result['error'] else result['outcome'],
+                     error=result['error'][:500] if result['error'] else None, duration=round(duration, 3))
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            AUDIT_DROPPED.inc()
+            return
+        self._start()
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < AUDIT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with app.app_context():
+                    self._write(batch)
+                    self._prune_if_due()
+            except Exception:
+                app.logger.exception("Writing %d audit entries failed", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        try:
+            db.session.execute(AuditEntry.__table__.insert(), batch)
+            db.session.commit()
+        finally:
+            db.session.remove()
+        AUDIT_FLUSH_LATENCY.observe(time.perf_counter() - started)
+
+    def _prune_if_due(self):
+        if self.retention_days <= 0 or time.monotonic() - self._pruned_at < AUDIT_PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.monotonic()
+        if self._lock_fd is None:
+            self._lock_fd = try_lock_file(self.lock_file)
+        if self._lock_fd is not None:
+            self.prune(time.time() - self.retention_days * 86400)
+
+    # Löscht Einträge vor "cutoff" in Portionen, jede in einer eigenen kurzen Transaktion
+    def prune(self, cutoff):
+        deleted = 0
+        try:
+            while True:
+                count = db.session.execute(
+                    text('DELETE FROM audit_entry WHERE id IN '
+                         '(SELECT id FROM audit_entry WHERE created_at < :cutoff LIMIT :limit)'),
+                    {'cutoff': cutoff, 'limit': AUDIT_PRUNE_BATCH}).rowcount
+                db.session.commit()
+                deleted += count
+                if count < AUDIT_PRUNE_BATCH:
+                    break
+                time.sleep(0.05)   # Schreiber anderer Worker dazwischenlassen
+        finally:
+            db.session.remove()
+        if deleted:
+            app.logger.info("Pruned %d audit entries", deleted)
+        return deleted
+
+    # Wartet, bis alle bisher angenommenen Einträge geschrieben sind (Tests, Prozessende)
+    def flush(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def reset(self):
+        # Nach fork(): Writer-Thread und Lock des Elternprozesses gelten nicht für den Worker
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._thread = None
+
+audit_log = AuditLog()
+atexit.register(audit_log.flush)
+
+# Seite der Audit-Einträge (neueste zuerst). Blättern über die ID ("before") statt OFFSET,
+# damit auch tiefe Seiten nur einen Indexbereich lesen. Gibt (Einträge, nächstes "before") zurück.
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 500
+
+def query_audit(filters, before=None, limit=AUDIT_PAGE_SIZE, container_ids=None):
+    query = AuditEntry.query
+    for field in ('user_id', 'container_id', 'target_type', 'target_id', 'source', 'action', 'outcome'):
+        if filters.get(field) is not None:
+            query = query.filter(getattr(AuditEntry, field) == filters[field])
+    if filters.get('since') is not None:
+        query = query.filter(AuditEntry.created_at >= filters['since'])
+    if filters.get('until') is not None:
+        query = query.filter(AuditEntry.created_at < filters['until'])
+    if container_ids is not None:
+        # Nicht-Admins: nur Einträge zu Containern, auf die sie Zugriff haben
+        query = query.filter(AuditEntry.container_id.in_(container_ids))
+    if before is not None:
+        query = query.filter(AuditEntry.id < before)
+    entries = query.order_by(AuditEntry.id.desc()).limit(limit + 1).all()
+    next_before = entries[limit - 1].id if len(entries) > limit else None
+    return entries[:limit], next_before
+
+def audit_entry_dict(entry):
+    return {column.name: getattr(entry, column.name) for column in AuditEntry.__table__.columns}
+
+@app.template_filter('timestamp')
+def format_timestamp(value):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(value))
+
+# Filter aus Query-Parametern; ValueError bei ungültigen Werten
+def parse_audit_filters(args):
+    filters = {}
+    for field in ('user_id', 'container_id', 'target_id'):
+        if args.get(field):
+            filters[field] = int(args[field])
+    for field in ('since', 'until'):
+        if args.get(field):
+            filters[field] = float(args[field])
+    for field in ('target_type', 'source', 'action', 'outcome'):
+        if args.get(field):
+            filters[field] = args[field]
+    return filters
+
+# ---------------------------
+# Background control jobs
+# ---------------------------
+# Lange Starts/Stops laufen auf einem eigenen Executor, damit die Flask-Worker frei
+# bleiben. Pro Ziel (Container oder Gruppe) gibt es höchstens einen aktiven Job.
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))          # gleichzeitig laufende Jobs
+JOB_MAX_ACTIVE = int(os.environ.get('JOB_MAX_ACTIVE', 32))   # wartende + laufende Jobs
+JOB_HISTORY = int(os.environ.get('JOB_HISTORY', 200))        # aufbewahrte Jobs inkl. abgeschlossener
+# Bei mehreren Worker-Prozessen: gemeinsames Verzeichnis für Job-Zustände, damit
+# /api/jobs/<id>, die Deduplizierung pro Ziel und die Ergebnismeldungen im Dashboard
+# prozessübergreifend funktionieren
+JOB_STATE_DIR = os.environ.get('JOB_STATE_DIR')
+
+class JobQueueFull(Exception):
+    pass
+
+class ControlJobManager:
+    def __init__(self, workers=JOB_WORKERS, max_active=JOB_MAX_ACTIVE, history=JOB_HISTORY, state_dir=JOB_STATE_DIR):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # job id -> job dict, älteste zuerst
+        self._active = {}            # (target_type, target_id) -> job id
+        self._claims = {}            # job id -> offene Lock-Datei des Ziels
+        # Job-Dateien schreibt ein eigener Thread: Fortschrittsmeldungen kommen aus der Docker-Schleife
+        # und dürfen dort nicht auf die Platte warten. Mehrere Änderungen bis zum Schreiben ergeben
+        # eine Datei-Version.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-state')
+        self._dirty = set()          # job ids, deren Datei noch geschrieben werden muss
+        self.max_active = max_active
+        self.history = history
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    # Ziel prozessübergreifend belegen (flock); gibt die ID eines fremden aktiven Jobs zurück
+    def _claim(self, key, job_id):
+        if not self.state_dir:
+            return None
+        lock_file = open(os.path.join(self.state_dir, f'target-{key[0]}-{key[1]}.lock'), 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.seek(0)
+            other = lock_file.read().strip()
+            lock_file.close()
+            return other or None
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(job_id)
+        lock_file.flush()
+        self._claims[job_id] = lock_file
+        return None
+
+    def _release(self, job_id):
+        lock_file = self._claims.pop(job_id, None)
+        if lock_file is not None:
+            lock_file.truncate(0)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _job_file(self, job_id):
+        return os.path.join(self.state_dir, f'{job_id}.json')
+
+    def _persist(self, job):
+        if self.state_dir:
+            self._write_state(self._public(job))
+
+    def _write_state(self, state):
+        tmp_file = f'{self._job_file(state["job_id"])}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self._job_file(state['job_id']))
+
+    # Aufruf mit self._lock; schreibt den Stand später im Writer-Thread
+    def _persist_later(self, job):
+        if not self.state_dir or job['job_id'] in self._dirty:
+            return
+        self._dirty.add(job['job_id'])
+        self._writer.submit(self._flush, job['job_id'])
+
+    def _flush(self, job_id):
+        with self._lock:
+            self._dirty.discard(job_id)
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            state = self._public(job)
+        try:
+            self._write_state(state)
+        except OSError as e:
+            app.logger.warning("Could not save state of job %s: %s", job_id, e)
+
+    def _notice_file(self, user_id, job_id):
+        return os.path.join(self.state_dir, f'notice-{user_id}-{job_id}.json')
+
+    def _remove_file(self, job_id, user_id):
+        for path in (self._job_file(job_id), self._notice_file(user_id, job_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Ergebnis eines UI-Jobs für den nächsten Seitenaufruf ablegen, egal welcher Worker ihn bedient
+    def _write_notice(self, job):
+        path = self._notice_file(job['user_id'], job['job_id'])
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump({'target_name': job['target_name'], 'action': job['action'],
+                           'errors': list(job['errors'].values()), 'finished_at': job['finished_at']}, f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            app.logger.warning("Could not save result of job %s: %s", job['job_id'], e)
+
+    def _load(self, job_id):
+        if not self.state_dir or not re.fullmatch(r'[0-9a-f]+', job_id):
+            return None
+        try:
+            with open(self._job_file(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Gibt (job, created) zurück; created ist False, wenn bereits ein Job für das Ziel läuft
+    def submit(self, user_id, target_type, target_id, target_name, action, plan, notify=False,
+               source='api', username=None):
+        key = (target_type, target_id)
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                return self._jobs[existing], False
+            if len(self._active) >= self.max_active:
+                raise JobQueueFull()
+            job_id = secrets.token_hex(8)
+            other = self._claim(key, job_id)
+            if other is not None:
+                existing = self._load(other)
+                if existing is not None:
+                    return existing, False
+                raise JobQueueFull()
+            job = {
+                'job_id': job_id,
+                'user_id': user_id,
+                'target_type': target_type,
+                'target_id': target_id,
+                'target_name': target_name,
+                'action': action,
+                'state': 'queued',
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'containers': {
+                    member['container_id']: {'docker_name': member['docker_name'], 'state': 'pending', 'error': None,
+                                             'outcome': None, 'duration': None, 'ready': None, 'ready_wait': None}
+                    for tier in plan for member in tier
+                },
+                'errors': {},
+                'notify': notify,   # Ergebnis beim nächsten Seitenaufruf in der UI anzeigen
+            }
+            self._jobs[job['job_id']] = job
+            self._active[key] = job['job_id']
+            self._trim()
+            self._persist(job)
+        audit = audit_context(user_id, username, source, target_type, target_id, target_name)
+        self._executor.submit(self._run, job, plan, audit)
+        return job, True
+
+    def _trim(self):
+        # Abgeschlossene Jobs verwerfen, bis die Historie wieder in die Grenze passt
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history:
+                break
+            if self._jobs[job_id]['state'] in ('done', 'failed'):
+                job = self._jobs.pop(job_id)
+                if self.state_dir:
+                    # Hinter noch ausstehenden Schreibvorgängen des Jobs
+                    self._writer.submit(self._remove_file, job_id, job['user_id'])
+
+    def _progress(self, job):
+        started = {}
+        def progress(member, state, result=None):
+            with self._lock:
+                entry = job['containers'][member['container_id']]
+                entry['state'] = state
+                if state == 'running':
+                    started[member['container_id']] = time.monotonic()
+                else:
+                    entry['duration'] = round(time.monotonic() - started[member['container_id']], 3)
+                    entry.update(result)
+                self._persist_later(job)
+        return progress
+
+    def _run(self, job, plan, audit):
+        with self._lock:
+            job['state'] = 'running'
+            job['started_at'] = time.time()
+            self._persist_later(job)
+        try:
+            errors = run_group_action(plan, job['action'], progress=self._progress(job), audit=audit)
+            state = 'done'
+        except Exception as e:
+            app.logger.exception("Control job %s failed", job['job_id'])
+            errors = {'job': str(e)}
+            state = 'failed'
+        with self._lock:
+            job['errors'] = errors
+            job['state'] = state
+            job['finished_at'] = time.time()
+            self._active.pop((job['target_type'], job['target_id']), None)
+            self._release(job['job_id'])
+            self._persist_later(job)
+        if job['notify'] and self.state_dir:
+            self._write_notice(job)
+        with self._lock:
+            self._trim()
+
+    # Abgeschlossene UI-Jobs eines Benutzers, deren Ergebnis noch nicht angezeigt wurde
+    def collect_notifications(self, user_id):
+        if self.state_dir:
+            return self._collect_notices(user_id)
+        finished = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job['notify'] and job['user_id'] == user_id and job['finished_at']:
+                    job['notify'] = False
+                    finished.append((job['target_name'], job['action'], list(job['errors'].values())))
+        return finished
+
+    # Wer die Datei einer Meldung löschen kann, zeigt sie an; so erscheint sie genau einmal
+    def _collect_notices(self, user_id):
+        prefix = f'notice-{user_id}-'
+        try:
+            names = [name for name in os.listdir(self.state_dir) if name.startswith(prefix) and name.endswith('.json')]
+        except OSError:
+            return []
+        notices = []
+        for name in names:
+            path = os.path.join(self.state_dir, name)
+            try:
+                with open(path) as f:
+                    notice = json.load(f)
+                os.remove(path)
+            except (OSError, ValueError):
+                continue
+            notices.append(notice)
+        notices.sort(key=lambda notice: notice['finished_at'])
+        return [(notice['target_name'], notice['action'], notice['errors']) for notice in notices]
 
-user_container = db.Table('user_container',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('container_id', db.Integer, db.ForeignKey('container.id'), primary_key=True)
-)
+    def _public(self, job):
+        result = dict(job)
+        del result['notify']
+        result['containers'] = {str(cid): dict(entry) for cid, entry in job['containers'].items()}
+        result['errors'] = {str(cid): err for cid, err in job['errors'].items()}
+        return result
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            result = self._public(job) if job is not None else None
+        if result is None:
+            # Job eines anderen Worker-Prozesses
+            result = self._load(job_id)
+            if result is None:
+                return None
+        if result['started_at']:
+            end = result['finished_at'] or time.time()
+            result['duration'] = round(end - result['started_at'], 3)
+        return result
+
+job_manager = ControlJobManager()
 
 # ---------------------------
-# Flask-Login configuration
+# Idle scale-to-zero
 # ---------------------------
-login_manager = LoginManager(app)
-login_manager.login_view = 'login_view'
+# Container und Gruppen mit "idle_timeout" werden gestoppt, wenn sie so lange keine Aktivität
+# zeigen: CPU bzw. Netzwerk-Durchsatz im Mittel über IDLE_WINDOW unter den Schwellen. Die Werte
+# stammen aus der Runde des Stats-Samplers (kein eigenes Polling); entschieden wird daher nur im
+# sampelnden Prozess. Gestoppt wird als Hintergrund-Job, Gruppen in umgekehrter Startreihenfolge.
+# Starts und /api/wake setzen den Zähler zurück (mtime einer Datei pro Container, damit es auch
+# aus anderen Worker-Prozessen ankommt).
+IDLE_CPU_THRESHOLD = float(os.environ.get('IDLE_CPU_THRESHOLD', 2))      # Prozent
+IDLE_NET_THRESHOLD = float(os.environ.get('IDLE_NET_THRESHOLD', 4096))   # Bytes/s empfangen + gesendet
+IDLE_WINDOW = int(os.environ.get('IDLE_WINDOW', 300))                    # Sekunden, über die gemittelt wird
+IDLE_STATE_DIR = os.path.join(DATA_DIR, 'idle')
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+IDLE_STOPS = metric('idle_stops_total', 'Containers and groups stopped after being idle.', 'counter', ('target',))
+
+class IdleManager:
+    def __init__(self, sampler, jobs, state_dir=IDLE_STATE_DIR):
+        self.sampler = sampler
+        self.jobs = jobs
+        self.state_dir = state_dir
+        self._active_at = {}   # Container-ID -> letzte Runde mit Aktivität (nur laufende Container)
+
+    def _touch_file(self, cont_id):
+        return os.path.join(self.state_dir, f'container-{cont_id}')
+
+    # Aktivität von außen (Start, Wake): verschiebt den Idle-Zeitpunkt
+    def touch(self, container_ids):
+        now = time.time()
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            for cont_id in container_ids:
+                path = self._touch_file(cont_id)
+                with open(path, 'a'):
+                    pass
+                os.utime(path, (now, now))
+        except OSError as e:
+            app.logger.warning("Could not record container activity: %s", e)
+
+    def _touched_at(self, cont_id):
+        try:
+            return os.stat(self._touch_file(cont_id)).st_mtime
+        except OSError:
+            return 0.0
+
+    # Mittelwerte über das Fenster; ohne verwertbare Werte gilt der Container als aktiv
+    def is_active(self, cont_id, now):
+        cpu, net = [], []
+        for row in self.sampler.history(cont_id, 'raw', now - IDLE_WINDOW):
+            if row[1] is not None:
+                cpu.append(row[1])
+            if row[4] is not None and row[5] is not None:
+                net.append(row[4] + row[5])
+        if not cpu and not net:
+            return True
+        return ((cpu and sum(cpu) / len(cpu) >= IDLE_CPU_THRESHOLD)
+                or (net and sum(net) / len(net) >= IDLE_NET_THRESHOLD))
+
+    # Listener des Stats-Samplers; "sampled" sind die IDs der laufenden Container dieser Runde
+    def on_stats_round(self, snapshot, sampled, now):
+        watched = {c.id for c in snapshot.containers.values() if c.idle_timeout}
+        for group in snapshot.groups.values():
+            if group.idle_timeout:
+                watched |= group.member_ids
+        for cont_id in list(self._active_at):
+            if cont_id not in sampled:
+                del self._active_at[cont_id]   # gestoppt: nach dem nächsten Start neu zählen
+        idle_for = {}
+        for cont_id in watched & sampled:
+            if cont_id not in self._active_at or self.is_active(cont_id, now):
+                self._active_at[cont_id] = now
+            idle_for[cont_id] = now - max(self._active_at[cont_id], self._touched_at(cont_id))
+
+        for cont in snapshot.containers.values():
+            if cont.idle_timeout and idle_for.get(cont.id, 0) >= cont.idle_timeout * 60:
+                plan = container_plan(cont)
+                self._stop('container', cont.id, cont.display_name, plan)
+        for group in snapshot.groups.values():
+            running = group.member_ids & sampled
+            if group.idle_timeout and running and all(idle_for[cid] >= group.idle_timeout * 60 for cid in running):
+                self._stop('group', group.id, group.name, build_group_plan(group))
+
+    def _stop(self, target_type, target_id, target_name, plan):
+        try:
+            job, created = self.jobs.submit(None, target_type, target_id, target_name, 'stop', plan, source='idle')
+        except JobQueueFull:
+            return
+        if created:
+            IDLE_STOPS.labels(target_type).inc()
+            app.logger.info("Stopping idle %s %s (job %s)", target_type, target_name, job['job_id'])
+
+idle_manager = IdleManager(stats_sampler, job_manager)
+stats_sampler.listeners.append(idle_manager)
 
 # ---------------------------
-# Forms
+# API key authentication
 # ---------------------------
-class ContainerForm(FlaskForm):
-    name = StringField('Internal Name', validators=[DataRequired()])
-    display_name = StringField('Display Name', validators=[DataRequired()])
-    docker_name = StringField('Docker Container Name', validators=[DataRequired()])
-    icon = FileField('Icon (optional)', validators=[FileAllowed(['jpg','jpeg','png','gif'], 'Only image files allowed')])
-    submit = SubmitField('Save')
+# API-Keys werden nur gehasht gespeichert (SHA-256 genügt für zufällige Keys mit hoher
+# Entropie). Neue Keys haben die Form "id.secret": die zufällige ID ist kein Teil des
+# Geheimnisses und dient als indizierter Suchschlüssel. Alte Keys ohne ID werden über ihren
+# Hash gefunden. Geprüfte Keys landen in einem kleinen TTL-Cache, damit HA-Polls keine
+# SQL-Abfrage mehr kosten.
+API_KEY_ID_BYTES = 6
+API_KEY_SECRET_BYTES = 24
+API_AUTH_CACHE_TTL = int(os.environ.get('API_AUTH_CACHE_TTL', 60))      # Sekunden
+API_AUTH_CACHE_SIZE = int(os.environ.get('API_AUTH_CACHE_SIZE', 1024))  # Einträge
 
-# Hier wird das Container-Feld als Checkbox-Liste dargestellt
-class GroupForm(FlaskForm):
-    name = StringField('Group Name', validators=[DataRequired()])
-    icon = FileField('Group Icon (optional)', validators=[FileAllowed(['jpg','jpeg','png','gif'], 'Only image files allowed')])
-    containers = SelectMultipleField('Containers', coerce=int, widget=widgets.ListWidget(prefix_label=False), option_widget=widgets.CheckboxInput())
-    submit = SubmitField('Create Group')
+# Was die API-Routen über den Benutzer wissen müssen, ohne ORM-Objekt
+ApiUser = namedtuple('ApiUser', 'id username role container_ids')
 
-# Login-Formular
-class LoginForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired()])
-    password = PasswordField('Password', validators=[DataRequired()])
-    submit = SubmitField('Login')
+def hash_api_key(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
 
-# Hier auch Checkboxen für die Container-Auswahl (benutzerverwaltung)
-class UserForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired()])
-    password = PasswordField('Password')
-    role = StringField('Role (admin/user)', validators=[DataRequired()])
-    containers = SelectMultipleField('Accessible Containers', coerce=int, widget=widgets.ListWidget(prefix_label=False), option_widget=widgets.CheckboxInput())
-    submit = SubmitField('Save')
+def generate_api_key():
+    return f"{secrets.token_hex(API_KEY_ID_BYTES)}.{secrets.token_hex(API_KEY_SECRET_BYTES)}"
 
-class ContainerOrderForm(FlaskForm):
-    submit = SubmitField('Save')
+# Gibt die ID eines "id.secret"-Keys zurück, None bei alten Keys
+def api_key_id(api_key):
+    key_id, sep, secret = api_key.partition('.')
+    return key_id if sep and key_id and secret else None
 
-class GroupOrderForm(FlaskForm):
-    submit = SubmitField('Save')
+def set_api_key(user, api_key):
+    user.api_key = None
+    user.api_key_id = api_key_id(api_key)
+    user.api_key_hash = hash_api_key(api_key)
+
+class ApiAuthCache:
+    def __init__(self, ttl=API_AUTH_CACHE_TTL, size=API_AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key hash -> (expires, ApiUser)
+
+    def get(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+            return entry[1]
+
+    def put(self, key_hash, api_user):
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl, api_user)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    # Ohne user_id wird der komplette Cache verworfen
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                return
+            for key_hash in [k for k, (_, u) in self._entries.items() if u.id == user_id]:
+                del self._entries[key_hash]
+
+api_auth_cache = ApiAuthCache()
+
+def verify_api_key(api_key):
+    key_hash = hash_api_key(api_key)
+    api_user = api_auth_cache.get(key_hash)
+    if api_user is not None:
+        return api_user
+    key_id = api_key_id(api_key)
+    if key_id is not None:
+        candidates = User.query.filter_by(api_key_id=key_id).all()
+    else:
+        candidates = User.query.filter_by(api_key_id=None, api_key_hash=key_hash).all()
+    for user in candidates:
+        if user.api_key_hash and hmac.compare_digest(user.api_key_hash, key_hash):
+            api_user = ApiUser(user.id, user.username, user.role, config_store.get().allowed_ids(user.id))
+            api_auth_cache.put(key_hash, api_user)
+            return api_user
+    return None
+
+# Liest den API-Key aus "Authorization: Bearer ..." oder aus den Parametern (api_key).
+# Der Benutzername ist optional, wird aber geprüft, falls er mitgeschickt wird.
+# Gibt (ApiUser, None) oder (None, Fehlerantwort) zurück.
+def authenticate_api(params):
+    auth = request.headers.get('Authorization', '')
+    if auth[:7].lower() == 'bearer ':
+        api_key = auth[7:].strip()
+    else:
+        api_key = params.get('api_key')
+    if not api_key:
+        return None, (jsonify({"error": "Missing parameters"}), 400)
+    api_user = verify_api_key(api_key)
+    username = params.get('username')
+    if api_user is None or (username and api_user.username != username):
+        return None, (jsonify({"error": "Invalid credentials or API key"}), 401)
+    return api_user, None
 
 # ---------------------------
 # API Endpoints
 # ---------------------------
 
+# Stellt eine Aktion als Hintergrund-Job ein und antwortet sofort mit 202 und der Job-ID
+def queue_job_response(user, target_type, target_id, target_name, action, plan):
+    try:
+        job, created = job_manager.submit(user.id, target_type, target_id, target_name, action, plan,
+                                          username=user.username)
+    except JobQueueFull:
+        return jsonify({"error": "Too many queued jobs"}), 429
+    if not created and job['action'] != action:
+        return jsonify({"error": f"A {job['action']} job is already running for this {target_type}",
+                        "job_id": job['job_id']}), 409
+    return jsonify({
+        "status": "queued" if created else "already queued",
+        "job_id": job['job_id'],
+        "job_url": url_for('api_job_status', job_id=job['job_id'])
+    }), 202
+
 # API: Steuert einen einzelnen Container
 @app.route('/api/control', methods=['POST'])
 def api_control():
-    data = request.get_json()
-    username = data.get('username')
-    api_key = data.get('api_key')
+    data = request.get_json(silent=True) or {}
     container_id = data.get('container_id')
     action = data.get('action')
-    if not all([username, api_key, container_id, action]):
+    if not all([container_id, action]):
         return jsonify({"error": "Missing parameters"}), 400
-    user = User.query.filter_by(username=username).first()
-    if not user or user.api_key != api_key:
-        return jsonify({"error": "Invalid credentials or API key"}), 401
-    container = Container.query.get(container_id)
+    user, error = authenticate_api(data)
+    if error:
+        return error
+    container = config_store.get().containers.get(parse_id(container_id))
     if not container:
         return jsonify({"error": "Container not found"}), 404
     # Unabhängig von Admin, wird immer geprüft, ob der Container in der Benutzerzuordnung enthalten ist
-    if container not in user.containers:
+    if container.id not in user.container_ids:
         return jsonify({"error": "Access denied to this container"}), 403
+    if action not in ("start", "stop"):
+        return jsonify({"error": "Invalid action"}), 400
+    if data.get('async'):
+        plan = container_plan(container)
+        return queue_job_response(user, 'container', container.id, container.display_name, action, plan)
+    if action == "start":
+        idle_manager.touch([container.id])
+    audit = audit_context(user.id, user.username, 'api', 'container', container.id, container.display_name)
+    member = container_plan(container)[0][0]
+    started = time.time()
+    outcome = error = None
     try:
-        docker_cont = client.containers.get(container.docker_name)
-        if action == "start":
-            docker_cont.start()
-        elif action == "stop":
-            docker_cont.stop()
-        else:
-            return jsonify({"error": "Invalid action"}), 400
+        outcome, _ = docker_async.run(control_container(container.docker_name, action, host_id=container.host_id,
+                                                        docker_id=container.docker_id))
     except docker.errors.NotFound:
-        return jsonify({"error": f"Container {container.docker_name} not found"}), 404
-    return jsonify({"status": "success", "container": container.display_name, "action": action})
+        error, code = f"Container {container.docker_name} not found", 404
+    except DockerUnavailable as e:
+        error, code = e.explanation, 503
+    except docker.errors.APIError as e:
+        # Übrige Daemon-Fehler (z. B. 500 beim Start) ebenfalls als JSON und im Audit-Log
+        error, code = f"Container {container.docker_name}: {e.explanation or e}", 502
+    audit_log.record(audit, action, member, {'error': error, 'outcome': outcome}, started, time.time() - started)
+    if error:
+        return jsonify({"error": error}), code
+    return jsonify({"status": "success", "container": container.display_name, "action": action, "outcome": outcome})
 
 # API: Gibt den Status eines einzelnen Containers zurück
 @app.route('/api/status', methods=['GET'])
 def api_status():
-    username = request.args.get('username')
-    api_key = request.args.get('api_key')
     container_id = request.args.get('container_id')
-    if not all([username, api_key, container_id]):
+    if not container_id:
         return jsonify({"error": "Missing parameters"}), 400
-    user = User.query.filter_by(username=username).first()
-    if not user or user.api_key != api_key:
-        return jsonify({"error": "Invalid credentials or API key"}), 401
-    container = Container.query.get(container_id)
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    container = config_store.get().containers.get(parse_id(container_id))
     if not container:
         return jsonify({"error": "Container not found"}), 404
-    if container not in user.containers:
+    if container.id not in user.container_ids:
         return jsonify({"error": "Access denied to this container"}), 403
-    try:
-        docker_cont = client.containers.get(container.docker_name)
-        status = docker_cont.status
-    except docker.errors.NotFound:
-        status = "not found"
-    return jsonify({"container_id": container.id, "container_name": container.display_name, "status": status})
+    status, = get_container_statuses([container])
+    return jsonify(mark_stale({"container_id": container.id, "container_name": container.display_name, "status": status},
+                              [container]))
 
 # API: Steuert alle Container einer Gruppe
 @app.route('/api/control_group', methods=['POST'])
 def api_control_group():
-    data = request.get_json()
-    username = data.get('username')
-    api_key = data.get('api_key')
+    data = request.get_json(silent=True) or {}
     group_id = data.get('group_id')
     action = data.get('action')
-    if not all([username, api_key, group_id, action]):
+    if not all([group_id, action]):
         return jsonify({"error": "Missing parameters"}), 400
-    user = User.query.filter_by(username=username).first()
-    if not user or user.api_key != api_key:
-        return jsonify({"error": "Invalid credentials or API key"}), 401
-    group = Group.query.get(group_id)
+    user, error = authenticate_api(data)
+    if error:
+        return error
+    group = config_store.get().groups.get(parse_id(group_id))
     if not group:
         return jsonify({"error": "Group not found"}), 404
     # Prüfe, ob alle Container der Gruppe dem Benutzer zugeordnet sind
-    if not all(gc.container in user.containers for gc in group.group_containers):
+    if not group.member_ids <= user.container_ids:
         return jsonify({"error": "Access denied to this group"}), 403
-    errors = {}
-    for gc in group.group_containers:
-        try:
-            docker_cont = client.containers.get(gc.container.docker_name)
-            if action == "start":
-                docker_cont.start()
-            elif action == "stop":
-                docker_cont.stop()
-            else:
-                return jsonify({"error": "Invalid action"}), 400
-        except docker.errors.NotFound:
-            errors[gc.container.id] = f"Container {gc.container.docker_name} not found"
+    if action not in ("start", "stop"):
+        return jsonify({"error": "Invalid action"}), 400
+    if data.get('async'):
+        return queue_job_response(user, 'group', group.id, group.name, action, build_group_plan(group))
+    outcomes = {}
+    audit = audit_context(user.id, user.username, 'api', 'group', group.id, group.name)
+    errors = run_group_action(build_group_plan(group), action, outcomes=outcomes, audit=audit)
+    if errors:
+        return jsonify({"status": "partial success", "errors": errors, "outcomes": outcomes})
+    return jsonify({"status": "success", "group": group.name, "action": action, "outcomes": outcomes})
+
+# API: Weckt einen (z.B. wegen Inaktivität gestoppten) Container oder eine Gruppe auf.
+# Läuft bereits alles, wird nur der Idle-Zähler zurückgesetzt; sonst wie ein Start.
+@app.route('/api/wake', methods=['POST'])
+def api_wake():
+    data = request.get_json(silent=True) or {}
+    if not data.get('container_id') and not data.get('group_id'):
+        return jsonify({"error": "Missing parameters"}), 400
+    user, error = authenticate_api(data)
+    if error:
+        return error
+    snapshot = config_store.get()
+    if data.get('container_id'):
+        container = snapshot.containers.get(parse_id(data['container_id']))
+        if not container:
+            return jsonify({"error": "Container not found"}), 404
+        if container.id not in user.container_ids:
+            return jsonify({"error": "Access denied to this container"}), 403
+        target_type, target_id, target_name = 'container', container.id, container.display_name
+        members = [container]
+        plan = container_plan(container)
+    else:
+        group = snapshot.groups.get(parse_id(data['group_id']))
+        if not group:
+            return jsonify({"error": "Group not found"}), 404
+        if not group.member_ids <= user.container_ids:
+            return jsonify({"error": "Access denied to this group"}), 403
+        target_type, target_id, target_name = 'group', group.id, group.name
+        members = [gc.container for gc in group.group_containers]
+        plan = build_group_plan(group)
+    idle_manager.touch([c.id for c in members])
+    if all(st == 'running' for st in get_container_statuses(members)):
+        return jsonify({"status": "running", target_type: target_name})
+    if data.get('async'):
+        return queue_job_response(user, target_type, target_id, target_name, 'start', plan)
+    outcomes = {}
+    audit = audit_context(user.id, user.username, 'api', target_type, target_id, target_name)
+    errors = run_group_action(plan, 'start', outcomes=outcomes, audit=audit)
     if errors:
-        return jsonify({"status": "partial success", "errors": errors})
-    return jsonify({"status": "success", "group": group.name, "action": action})
+        return jsonify({"status": "partial success", "errors": errors, "outcomes": outcomes})
+    return jsonify({"status": "started", target_type: target_name, "outcomes": outcomes})
 
 # API: Gibt den Status einer Gruppe zurück
 @app.route('/api/group_status', methods=['GET'])
 def api_group_status():
-    username = request.args.get('username')
-    api_key = request.args.get('api_key')
     group_id = request.args.get('group_id')
-    if not all([username, api_key, group_id]):
+    if not group_id:
         return jsonify({"error": "Missing parameters"}), 400
-    user = User.query.filter_by(username=username).first()
-    if not user or user.api_key != api_key:
-        return jsonify({"error": "Invalid credentials or API key"}), 401
-    group = Group.query.get(group_id)
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    group = config_store.get().groups.get(parse_id(group_id))
     if not group:
         return jsonify({"error": "Group not found"}), 404
-    if not all(gc.container in user.containers for gc in group.group_containers):
+    if not group.member_ids <= user.container_ids:
         return jsonify({"error": "Access denied to this group"}), 403
     total = len(group.group_containers)
-    running = 0
-    statuses = {}
-    for gc in group.group_containers:
-        try:
-            docker_cont = client.containers.get(gc.container.docker_name)
-            st = docker_cont.status
-            statuses[gc.container.id] = st
-            if st == 'running':
-                running += 1
-        except docker.errors.NotFound:
-            statuses[gc.container.id] = "not found"
-    return jsonify({
+    results = get_container_statuses([gc.container for gc in group.group_containers])
+    statuses = {gc.container.id: st for gc, st in zip(group.group_containers, results)}
+    running = results.count('running')
+    return jsonify(mark_stale({
         "group_id": group.id,
         "group_name": group.name,
         "status": f"{running}/{total}",
         "container_statuses": statuses
-    })
+    }, [gc.container for gc in group.group_containers]))
+
+# API: Mehrere Container und Gruppen in einem Request steuern
+# Authentifizierung und ACL-Prüfung einmal für alle Einträge; alle Aktionen laufen gleichzeitig,
+# zusammen höchstens BATCH_PARALLELISM Container. Gruppen behalten ihre Startreihenfolge.
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 100))
+BATCH_PARALLELISM = int(os.environ.get('BATCH_PARALLELISM', 8))
+
+async def run_batch_item(item, limit):
+    started = time.perf_counter()
+    outcomes = {}
+    errors = await run_group_action_async(item['plan'], item['action'], limit=limit, outcomes=outcomes,
+                                          audit=item['audit'])
+    result = item['result']
+    if 'group_id' in result:
+        result['status'] = 'partial success' if errors else 'success'
+        result['outcomes'] = outcomes
+        if errors:
+            result['errors'] = errors
+    elif errors:
+        result['status'] = 'error'
+        result['error'] = next(iter(errors.values()))
+    else:
+        result['status'] = 'success'
+        result['outcome'] = next(iter(outcomes.values()))
+    result['duration'] = round(time.perf_counter() - started, 3)
+    return result
+
+async def run_batch(items, on_result):
+    limit = asyncio.Semaphore(max(1, BATCH_PARALLELISM))
+
+    async def run_item(item):
+        try:
+            result = await run_batch_item(item, limit)
+        except Exception as e:
+            app.logger.exception("Batch item %s failed", item['result'])
+            result = dict(item['result'], status='error', error=str(e))
+        on_result(result)
+    await asyncio.gather(*(run_item(item) for item in items))
+
+@app.route('/api/control_batch', methods=['POST'])
+def api_control_batch():
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing parameters"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+    user, error = authenticate_api(data)
+    if error:
+        return error
+    snapshot = config_store.get()
+    runnable = []
+    results = []
+    for index, entry in enumerate(items):
+        entry = entry if isinstance(entry, dict) else {}
+        action = entry.get('action')
+        result = {"index": index, "action": action}
+        if entry.get('group_id') is not None:
+            group = snapshot.groups.get(parse_id(entry['group_id']))
+            result['group_id'] = group.id if group else entry['group_id']
+            if not group:
+                result['error'] = "Group not found"
+            elif not group.member_ids <= user.container_ids:
+                result['error'] = "Access denied to this group"
+            else:
+                plan = build_group_plan(group)
+                audit = audit_context(user.id, user.username, 'api', 'group', group.id, group.name)
+        elif entry.get('container_id') is not None:
+            container = snapshot.containers.get(parse_id(entry['container_id']))
+            result['container_id'] = container.id if container else entry['container_id']
+            if not container:
+                result['error'] = "Container not found"
+            elif container.id not in user.container_ids:
+                result['error'] = "Access denied to this container"
+            else:
+                plan = container_plan(container)
+                audit = audit_context(user.id, user.username, 'api', 'container', container.id, container.display_name)
+        else:
+            result['error'] = "Missing container_id or group_id"
+        if 'error' not in result and action not in ("start", "stop"):
+            result['error'] = "Invalid action"
+        if 'error' in result:
+            result['status'] = 'error'
+            results.append(result)
+        else:
+            runnable.append({'plan': plan, 'action': action, 'result': result, 'audit': audit})
+
+    started = time.perf_counter()
+    finished = queue.Queue()
+    done = docker_async.submit(run_batch(runnable, finished.put))
+
+    def summary(results):
+        ok = all(r['status'] == 'success' for r in results)
+        return {"status": "success" if ok else "partial success",
+                "duration": round(time.perf_counter() - started, 3)}
+
+    if data.get('stream'):
+        # Ergebnisse als NDJSON, jeweils sobald ein Eintrag fertig ist; zuletzt eine Zusammenfassung
+        def generate():
+            streamed = list(results)
+            for result in results:
+                yield json.dumps(result) + '\n'
+            for _ in runnable:
+                result = finished.get()
+                streamed.append(result)
+                yield json.dumps(result) + '\n'
+            yield json.dumps(dict(summary(streamed), done=True)) + '\n'
+        return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+    done.result()
+    while not finished.empty():
+        results.append(finished.get())
+    results.sort(key=lambda r: r['index'])
+    return jsonify(dict(summary(results), results=results))
+
+# Antwortet der Docker-Daemon nicht, wird der zuletzt bekannte Status mit "stale": true geliefert
+def mark_stale(payload, containers=None):
+    if status_is_stale(containers):
+        payload['stale'] = True
+    return payload
+
+# "1,2,3" -> {1, 2, 3}; None, wenn kein Filter angegeben ist
+def parse_id_list(value):
+    if not value:
+        return None
+    return {int(v) for v in value.split(',') if v.strip()}
+
+# API: Gibt den Status aller Container und Gruppen zurück, auf die der Benutzer Zugriff hat
+# (ein Aufruf für alle Home-Assistant-Sensoren)
+@app.route('/api/status_bulk', methods=['GET'])
+@app.route('/api/snapshot', methods=['GET'])
+def api_status_bulk():
+    only = request.args.get('only')  # "containers" oder "groups"
+    try:
+        container_ids = parse_id_list(request.args.get('container_ids'))
+        group_ids = parse_id_list(request.args.get('group_ids'))
+    except ValueError:
+        return jsonify({"error": "Invalid id list"}), 400
+    if only not in (None, 'containers', 'groups'):
+        return jsonify({"error": "Invalid filter"}), 400
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    # Ein einziges Listing pro Host (alle Hosts gleichzeitig) statt eines Inspects pro Container
+    docker_hosts.ensure_fresh()
+    visible_containers, visible_groups = config_store.get().api_view(user.container_ids)
+    if only == 'groups':
+        visible_containers = []
+    elif container_ids is not None:
+        visible_containers = [cont for cont in visible_containers if cont.id in container_ids]
+    if only == 'containers':
+        visible_groups = []
+    elif group_ids is not None:
+        visible_groups = [group for group in visible_groups if group.id in group_ids]
+    # Was dann noch fehlt (Host nicht erreichbar), wird gleichzeitig mit dem Timeout des jeweiligen Hosts abgefragt
+    needed = {cont.id: cont for cont in visible_containers}
+    for group in visible_groups:
+        needed.update((gc.container.id, gc.container) for gc in group.group_containers)
+    status_by_id = dict(zip(needed, get_container_statuses(list(needed.values()))))
+    containers = {}
+    for cont in visible_containers:
+        containers[str(cont.id)] = {
+            "container_name": cont.display_name,
+            "status": status_by_id[cont.id]
+        }
+    groups = {}
+    for group in visible_groups:
+        statuses = {}
+        running = 0
+        for gc in group.group_containers:
+            st = status_by_id[gc.container.id]
+            statuses[str(gc.container.id)] = st
+            if st == 'running':
+                running += 1
+        total = len(group.group_containers)
+        groups[str(group.id)] = {
+            "group_name": group.name,
+            "status": f"{running}/{total}",
+            "running": running,
+            "total": total,
+            "container_statuses": statuses
+        }
+    return jsonify(mark_stale({"containers": containers, "groups": groups}, needed.values()))
+
+STATS_RESOLUTIONS = ('raw', '1m', '1h')
+
+def container_stats_payload(cont, resolution, since):
+    payload = {"container_id": cont.id, "container_name": cont.display_name,
+               "current": stats_sampler.current(cont.id)}
+    if resolution:
+        payload["history"] = stats_sampler.history(cont.id, resolution, since)
+    return payload
+
+# API: CPU, Speicher, Netzwerk und Block-IO aus dem Speicher des Samplers (keine Docker-Calls).
+# Mit container_id wie /api/status für einen Container, sonst für alle sichtbaren (Filter: container_ids).
+# history=raw|1m|1h liefert zusätzlich den Verlauf (Zeilen nach "fields"), optional ab "since".
+@app.route('/api/stats', methods=['GET'])
+def api_stats():
+    resolution = request.args.get('history')
+    if resolution is not None and resolution not in STATS_RESOLUTIONS:
+        return jsonify({"error": "Invalid history resolution"}), 400
+    try:
+        container_ids = parse_id_list(request.args.get('container_ids'))
+        since = float(request.args.get('since') or 0)
+    except ValueError:
+        return jsonify({"error": "Invalid parameters"}), 400
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    if not stats_sampler.enabled:
+        return jsonify({"error": "Stats sampling is disabled"}), 404
+    meta = {"interval": stats_sampler.interval, "fields": STATS_FIELDS}
+    if 'container_id' in request.args:
+        container = config_store.get().containers.get(parse_id(request.args.get('container_id')))
+        if not container:
+            return jsonify({"error": "Container not found"}), 404
+        if container.id not in user.container_ids:
+            return jsonify({"error": "Access denied to this container"}), 403
+        return jsonify(dict(meta, **container_stats_payload(container, resolution, since)))
+    visible_containers, _ = config_store.get().api_view(user.container_ids)
+    containers = {str(cont.id): container_stats_payload(cont, resolution, since) for cont in visible_containers
+                  if container_ids is None or cont.id in container_ids}
+    return jsonify(dict(meta, containers=containers))
+
+# API: Fortschritt eines Hintergrund-Jobs (API-Key oder angemeldete UI-Sitzung)
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    if current_user.is_authenticated:
+        user = current_user
+    else:
+        user, error = authenticate_api(request.args)
+        if error:
+            return error
+    job = job_manager.get(job_id)
+    if not job or (job['user_id'] != user.id and user.role != 'admin'):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+# API: Audit-Log der Start/Stop-Aktionen, neueste zuerst. Admins sehen alle Einträge, andere
+# Benutzer die ihrer Container. Weiterblättern mit before=<next_before> der vorherigen Seite.
+# Filter: user_id, container_id, target_type, target_id, source, action, outcome, since, until.
+@app.route('/api/audit', methods=['GET'])
+def api_audit():
+    try:
+        filters = parse_audit_filters(request.args)
+        before = parse_id(request.args.get('before')) if request.args.get('before') else None
+        limit = min(max(int(request.args.get('limit') or AUDIT_PAGE_SIZE), 1), AUDIT_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "Invalid parameters"}), 400
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    container_ids = None if user.role == 'admin' else user.container_ids
+    entries, next_before = query_audit(filters, before, limit, container_ids)
+    return jsonify({"entries": [audit_entry_dict(entry) for entry in entries], "next_before": next_before})
+
+# ---------------------------
+# Server-Sent Events: live status updates
+# ---------------------------
+SSE_HEARTBEAT = 15   # Sekunden zwischen Keepalive-Kommentaren
+# Mit gthread belegt jeder offene Stream einen Worker-Thread; ohne Obergrenze legen ein paar
+# Dashboard-Tabs alle Threads lahm, auch /healthz. Unter gevent (WEB_WORKER_CLASS=gevent) kostet
+# ein wartender Stream nur einen Greenlet, dann gibt es standardmäßig keine Obergrenze.
+_gevent_monkey = sys.modules.get('gevent.monkey')
+GREEN_THREADS = _gevent_monkey is not None and _gevent_monkey.is_module_patched('threading')
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 0 if GREEN_THREADS else
+                                     max(1, int(os.environ.get('WEB_THREADS', 16)) // 4)))  # pro Prozess, 0 = unbegrenzt
+
+SSE_STREAMS_ACTIVE = metric('sse_streams_active', 'Status event streams currently open.', 'gauge')
+SSE_STREAMS_REJECTED = metric('sse_streams_rejected_total', 'Status event streams rejected by SSE_MAX_STREAMS.', 'counter')
+SSE_STREAMS_ACTIVE_ALL = SSE_STREAMS_ACTIVE.labels()
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS) if SSE_MAX_STREAMS > 0 else None
+
+# Nur IDs, Hosts und Docker-Namen, damit der Stream ohne DB-Session auskommt
+def build_status_view(containers, groups):
+    return {
+        'containers': [(c.id, c.host_id, c.docker_name) for c in containers],
+        'groups': [(g.id, [(gc.container.id, gc.container.host_id, gc.container.docker_name)
+                           for gc in g.group_containers]) for g in groups],
+    }
+
+def sse_message(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def status_event_stream(view):
+    if sse_slots is not None and not sse_slots.acquire(blocking=False):
+        SSE_STREAMS_REJECTED.labels().inc()
+        return jsonify({"error": "Too many open event streams on this server"}), 429, {'Retry-After': '30'}
+    # Änderungen kommen als ((host_id, docker_name), status)
+    by_name = {}
+    for cont_id, host_id, docker_name in view['containers']:
+        by_name.setdefault((host_id, docker_name), []).append(('container', cont_id))
+    for group_id, members in view['groups']:
+        for _, host_id, docker_name in members:
+            by_name.setdefault((host_id, docker_name), []).append(('group', group_id))
+    groups = dict(view['groups'])
+
+    def group_payload(group_id):
+        statuses = {str(cid): get_container_status(name, host_id=host_id) for cid, host_id, name in groups[group_id]}
+        running = sum(1 for st in statuses.values() if st == 'running')
+        return {"group_id": group_id, "status": f"{running}/{len(statuses)}", "running": running,
+                "total": len(statuses), "container_statuses": statuses}
+
+    def snapshot():
+        return sse_message('snapshot', {
+            "containers": {str(cid): get_container_status(name, host_id=host_id)
+                           for cid, host_id, name in view['containers']},
+            "groups": {str(gid): group_payload(gid) for gid in groups},
+        })
+
+    def generate():
+        docker_hosts.ensure_fresh()
+        seq = status_broadcaster.seq
+        yield "retry: 5000\n\n"
+        yield snapshot()
+        while True:
+            seq, changes = status_broadcaster.wait(seq, SSE_HEARTBEAT)
+            if changes is None:
+                # Puffer übergelaufen: vollständigen Stand neu senden
+                yield snapshot()
+                continue
+            if not changes:
+                yield ": keepalive\n\n"
+                continue
+            touched_groups = set()
+            for _, key, status in changes:
+                for kind, target_id in by_name.get(key, ()):
+                    if kind == 'container':
+                        yield sse_message('container', {"container_id": target_id, "status": status})
+                    else:
+                        touched_groups.add(target_id)
+            for group_id in touched_groups:
+                yield sse_message('group', group_payload(group_id))
+
+    # Auch wenn der Client trennt, bevor der Generator gestartet ist
+    def close():
+        if sse_slots is not None:
+            sse_slots.release()
+        SSE_STREAMS_ACTIVE_ALL.dec()
+
+    SSE_STREAMS_ACTIVE_ALL.inc()
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(close)
+    return response
+
+# API: Live-Statusänderungen aller Container/Gruppen des Benutzers als SSE-Stream
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    containers, groups = config_store.get().api_view(user.container_ids)
+    return status_event_stream(build_status_view(containers, groups))
+
+# UI: gleicher Stream für das Dashboard (Session-Login)
+@app.route('/events', methods=['GET'])
+@login_required
+def events_view():
+    individual_containers, groups = dashboard_layout(current_user)
+    return status_event_stream(build_status_view(individual_containers, groups))
+
+# ---------------------------
+# Container logs
+# ---------------------------
+# /api/logs (API-Key) und /logs/<id>/stream (Dashboard) reichen den Docker-Log-Stream direkt an
+# den Client weiter. Vom Daemon wird erst gelesen, wenn der Client den vorigen Block abgenommen
+# hat: Ein langsamer Client bremst den Daemon über TCP, statt dass sich Logs im Speicher stauen
+# (pro Stream höchstens ein Block plus eine angefangene Zeile je stdout/stderr). Gleichzeitige
+# Streams sind pro Benutzer (über alle Worker, per Lock-Dateien) und pro Prozess begrenzt.
+LOGS_MAX_STREAMS_PER_USER = int(os.environ.get('LOGS_MAX_STREAMS_PER_USER', 3))
+LOGS_MAX_STREAMS = int(os.environ.get('LOGS_MAX_STREAMS', 8))          # pro Prozess, hält Threads für andere Requests frei
+LOGS_MAX_DURATION = float(os.environ.get('LOGS_MAX_DURATION', 3600))   # Sekunden, nach denen ein Stream endet
+LOGS_DEFAULT_TAIL = 100
+LOGS_CHUNK_SIZE = 64 * 1024    # Bytes pro Lesevorgang vom Daemon
+LOGS_MAX_LINE = 16 * 1024      # längere Zeilen werden in Stücke geteilt
+LOGS_MAX_PATTERN = 200         # Zeichen im Filter-Regex
+LOGS_LOCK_DIR = os.path.join(DATA_DIR, 'logs')
+# "10m", "2h", "1d" relativ zu jetzt, sonst Unix-Zeitstempel
+LOG_TIME_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([smhd]?)$')
+LOG_TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+LOG_STREAMS_ACTIVE = metric('log_streams_active', 'Container log streams currently open.', 'gauge')
+LOG_STREAM_BYTES = metric('log_stream_bytes_total', 'Log bytes read from Docker for log streams.', 'counter')
+LOG_STREAMS_REJECTED = metric('log_streams_rejected_total', 'Log streams rejected by a concurrency limit.', 'counter', ('limit',))
+LOG_STREAMS_ACTIVE_ALL = LOG_STREAMS_ACTIVE.labels()
+LOG_STREAM_BYTES_ALL = LOG_STREAM_BYTES.labels()
+
+class DockerLogStream:
+    def __init__(self, reader, writer, headers, tty):
+        self.reader = reader
+        self.writer = writer
+        self.chunked = headers.get('transfer-encoding', '').lower() == 'chunked'
+        self.tty = tty
+        self._chunk_left = 0    # Bytes im aktuellen HTTP-Chunk
+        self._frame_left = 0    # Bytes im aktuellen stdout/stderr-Frame
+        self._frame_stream = 'stdout'
+        self._header = b''      # angefangener 8-Byte-Frame-Header
+
+    async def _read_body(self):
+        if not self.chunked:
+            return await self.reader.read(LOGS_CHUNK_SIZE)
+        if self._chunk_left == 0:
+            line = await self.reader.readline()
+            if not line:
+                return b''
+            self._chunk_left = int(line.split(b';')[0], 16)
+            if self._chunk_left == 0:
+                return b''
+        data = await self.reader.read(min(self._chunk_left, LOGS_CHUNK_SIZE))
+        if not data:
+            return b''
+        self._chunk_left -= len(data)
+        if self._chunk_left == 0:
+            await self.reader.readexactly(2)
+        return data
+
+    # Nächster Block als Liste von (stream, bytes), None am Ende. Ohne TTY sind stdout und
+    # stderr in Frames mit 8-Byte-Header gemultiplext, die beliebig über Blöcke verteilt sein können.
+    async def read(self):
+        data = await self._read_body()
+        if not data:
+            return None
+        LOG_STREAM_BYTES_ALL.inc(len(data))
+        if self.tty:
+            return [('stdout', data)]
+        parts = []
+        data = self._header + data
+        self._header = b''
+        pos = 0
+        while pos < len(data):
+            if self._frame_left == 0:
+                if len(data) - pos < 8:
+                    self._header = data[pos:]
+                    break
+                self._frame_stream = 'stderr' if data[pos] == 2 else 'stdout'
+                self._frame_left = int.from_bytes(data[pos + 4:pos + 8], 'big')
+                pos += 8
+                continue
+            piece = data[pos:pos + self._frame_left]
+            parts.append((self._frame_stream, piece))
+            pos += len(piece)
+            self._frame_left -= len(piece)
+        return parts
+
+    async def close(self):
+        self.writer.close()
+
+# Zerlegt die Blöcke je Stream in Zeilen; der angefangene Rest wartet auf den nächsten Block
+class LogLineSplitter:
+    def __init__(self, pattern=None):
+        self.pattern = pattern
+        self._partial = {}   # stream -> angefangene Zeile
+
+    def _emit(self, stream, raw, lines):
+        line = raw.decode('utf-8', 'replace').rstrip('\r')
+        if self.pattern is None or self.pattern.search(line):
+            lines.append((stream, line))
+
+    def feed(self, stream, data):
+        lines = []
+        *complete, rest = (self._partial.pop(stream, b'') + data).split(b'\n')
+        for raw in complete:
+            self._emit(stream, raw, lines)
+        while len(rest) >= LOGS_MAX_LINE:
+            self._emit(stream, rest[:LOGS_MAX_LINE], lines)
+            rest = rest[LOGS_MAX_LINE:]
+        if rest:
+            self._partial[stream] = rest
+        return lines
+
+    def flush(self):
+        lines = []
+        for stream, rest in self._partial.items():
+            self._emit(stream, rest, lines)
+        self._partial = {}
+        return lines
+
+# Ein Slot pro Stream: prozessweit per Semaphore, pro Benutzer über Lock-Dateien, die auch andere
+# Worker sehen (stirbt ein Worker, gibt das Betriebssystem seine Slots frei).
+class LogStreamLimiter:
+    def __init__(self, per_user=LOGS_MAX_STREAMS_PER_USER, total=LOGS_MAX_STREAMS, lock_dir=LOGS_LOCK_DIR):
+        self.per_user = per_user
+        self.lock_dir = lock_dir
+        self._slots = threading.BoundedSemaphore(total)
+
+    # Gibt (fd, None) oder (None, überschrittenes Limit) zurück
+    def acquire(self, user_id):
+        if not self._slots.acquire(blocking=False):
+            LOG_STREAMS_REJECTED.labels('process').inc()
+            return None, 'process'
+        for slot in range(self.per_user):
+            fd = try_lock_file(os.path.join(self.lock_dir, f'{user_id}.{slot}.lock'))
+            if fd is not None:
+                return fd, None
+        self._slots.release()
+        LOG_STREAMS_REJECTED.labels('user').inc()
+        return None, 'user'
+
+    def release(self, fd):
+        os.close(fd)
+        self._slots.release()
+
+log_limiter = LogStreamLimiter()
+
+def parse_log_time(value):
+    match = LOG_TIME_PATTERN.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid time: {value}")
+    number, unit = float(match.group(1)), match.group(2)
+    return int(time.time() - number * LOG_TIME_UNITS[unit]) if unit else int(number)
+
+# Gibt (Docker-Parameter, Filter-Regex oder None, follow) zurück; ValueError bei ungültigen Angaben
+def parse_log_params(args):
+    follow = args.get('follow', '0').lower() in ('1', 'true')
+    params = {'stdout': 1, 'stderr': 1, 'follow': int(follow),
+              'timestamps': int(args.get('timestamps', '0').lower() in ('1', 'true'))}
+    tail = args.get('tail', str(LOGS_DEFAULT_TAIL))
+    if tail != 'all' and not tail.isdigit():
+        raise ValueError("tail must be a number or 'all'")
+    params['tail'] = tail
+    for key in ('since', 'until'):
+        if args.get(key):
+            params[key] = parse_log_time(args[key])
+    pattern = args.get('grep')
+    if pattern:
+        if len(pattern) > LOGS_MAX_PATTERN:
+            raise ValueError(f"grep pattern longer than {LOGS_MAX_PATTERN} characters")
+        try:
+            pattern = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid grep pattern: {e}")
+    return params, pattern or None, follow
+
+def render_log_lines(lines, sse):
+    if sse:
+        return ''.join(sse_message('log', {"stream": stream, "line": line}) for stream, line in lines)
+    return ''.join(f"{line}\n" for _, line in lines)
+
+# Öffnet den Log-Stream (Fehler werden noch als HTTP-Status gemeldet) und liefert die Antwort,
+# die ihn blockweise weiterreicht. Stream und Slot werden beim Schließen der Antwort freigegeben.
+def container_logs_response(user_id, container, args, sse=False):
+    sse = sse or args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+    try:
+        params, pattern, follow = parse_log_params(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Backend vor dem Lease auflösen: ein unbekannter/nicht erreichbarer Host belegt keinen Platz
+    try:
+        api = docker_hosts.get(container.host_id).api
+    except DockerUnavailable as e:
+        return jsonify({"error": e.explanation}), 503
+    lease, limit = log_limiter.acquire(user_id)
+    if lease is None:
+        error = (f"Too many open log streams (at most {LOGS_MAX_STREAMS_PER_USER} per user)" if limit == 'user'
+                 else "Too many open log streams on this server")
+        return jsonify({"error": error}), 429, {'Retry-After': '5'}
+    try:
+        info = api.run(api.inspect(container.docker_name))
+        stream = api.run(api.open_logs(info['Id'], params, tty=info.get('Config', {}).get('Tty')))
+    except docker.errors.NotFound:
+        error, code = f"Container {container.docker_name} not found", 404
+    except DockerUnavailable as e:
+        error, code = e.explanation, 503
+    except docker.errors.APIError as e:
+        error, code = e.explanation or str(e), 502
+    except BaseException:
+        log_limiter.release(lease)
+        raise
+    else:
+        error = None
+    if error:
+        log_limiter.release(lease)
+        return jsonify({"error": error}), code
+
+    def generate():
+        splitter = LogLineSplitter(pattern)
+        deadline = time.monotonic() + LOGS_MAX_DURATION
+        pending = None
+        timed_out = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                if pending is None:
+                    pending = api.submit(stream.read())
+                try:
+                    parts = pending.result(min(SSE_HEARTBEAT, remaining))
+                except FutureTimeoutError:
+                    # Ruhiger Container: Keepalive, damit getrennte Clients auffallen
+                    if sse:
+                        yield ": keepalive\n\n"
+                    continue
+                pending = None
+                if parts is None:
+                    break
+                output = render_log_lines([line for part in parts for line in splitter.feed(*part)], sse)
+                if output:
+                    yield output
+            output = render_log_lines(splitter.flush(), sse)
+            if output:
+                yield output
+            if sse:
+                yield sse_message('end', {"follow": follow, "timed_out": timed_out})
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            app.logger.warning("Log stream of %s interrupted: %s", container.docker_name, e)
+            if sse:
+                yield sse_message('stream_error', {"error": f"Log stream interrupted: {e}"})
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    # Auch wenn der Client trennt, bevor der Generator gestartet ist
+    def close():
+        api.submit(stream.close())
+        log_limiter.release(lease)
+        LOG_STREAMS_ACTIVE_ALL.dec()
+
+    LOG_STREAMS_ACTIVE_ALL.inc()
+    response = Response(generate(), mimetype='text/event-stream' if sse else 'text/plain',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(close)
+    return response
+
+# API: Logs eines Containers streamen (Auth und Zugriffsrechte wie /api/status)
+@app.route('/api/logs', methods=['GET'])
+def api_logs():
+    container_id = request.args.get('container_id')
+    if not container_id:
+        return jsonify({"error": "Missing parameters"}), 400
+    user, error = authenticate_api(request.args)
+    if error:
+        return error
+    container = config_store.get().containers.get(parse_id(container_id))
+    if not container:
+        return jsonify({"error": "Container not found"}), 404
+    if container.id not in user.container_ids:
+        return jsonify({"error": "Access denied to this container"}), 403
+    return container_logs_response(user.id, container, request.args)
+
+def visible_container(container_id):
+    snapshot = config_store.get()
+    cont = snapshot.containers.get(container_id)
+    if cont and current_user.role != 'admin' and cont.id not in snapshot.allowed_ids(current_user.id):
+        return None
+    return cont
+
+# UI: Log-Panel eines Containers ...
+@app.route('/logs/<int:container_id>', methods=['GET'])
+@login_required
+def container_logs_view(container_id):
+    cont = visible_container(container_id)
+    if cont is None:
+        flash("Container not found or access denied.", "danger")
+        return redirect(url_for('index'))
+    return render_template('container_logs.html', container=cont, default_tail=LOGS_DEFAULT_TAIL)
+
+# ... und sein SSE-Stream (Session-Login)
+@app.route('/logs/<int:container_id>/stream', methods=['GET'])
+@login_required
+def container_logs_stream_view(container_id):
+    cont = visible_container(container_id)
+    if cont is None:
+        return jsonify({"error": "Container not found or access denied"}), 404
+    return container_logs_response(current_user.id, cont, request.args, sse=True)
 
 # ---------------------------
 # New Route: Generate API Key for a User (Admin UI)
@@ -261,11 +3940,15 @@ def generate_api_key_for_user(user_id):
     if not user:
         flash("User not found.", "danger")
         return redirect(url_for('admin_users_view'))
-    new_key = secrets.token_hex(16)
-    user.api_key = new_key
+    new_key = generate_api_key()
+    set_api_key(user, new_key)
     db.session.commit()
-    flash("New API key generated for user.", "success")
-    return redirect(url_for('admin_edit_user_view', user_id=user_id))
+    # Der Key wird nur gehasht gespeichert und nur in dieser Antwort angezeigt
+    # (nicht per flash(): das Session-Cookie ist zwar signiert, aber nicht verschlüsselt)
+    form = UserForm(obj=user)
+    form.containers.choices = [(c.id, c.display_name) for c in Container.query.all()]
+    return (render_template('admin_edit_user.html', form=form, user=user, new_api_key=new_key),
+            {'Cache-Control': 'no-store'})
 
 # ---------------------------
 # Normal Routes (UI)
@@ -290,75 +3973,108 @@ def logout_view():
     flash('Logged out.', 'info')
     return redirect(url_for('login_view'))
 
+# Container und Gruppen, die ein Benutzer auf dem Dashboard sieht
+def dashboard_layout(user):
+    return config_store.get().dashboard_layout(user.id)
+
+STATUS_PENDING = '…'   # Platzhalter, bis der Status nachgeliefert wird
+
+# Löst die Status gleichzeitig auf dem Docker-Loop auf und liefert sie in Abschlussreihenfolge:
+# ('container', {...}) pro Container und ('group', {...}), sobald alle Container einer Gruppe bekannt sind.
+def dashboard_status_updates(pending, groups, statuses):
+    results = queue.Queue()
+
+    async def resolve_all():
+        limit = asyncio.Semaphore(DOCKER_ASYNC_CONCURRENCY)
+
+        async def resolve(cont):
+            try:
+                async with limit:
+                    status = await container_status_async(cont.docker_name, cont.docker_id, cont.host_id)
+            except Exception:
+                app.logger.exception("Could not resolve status of %s", cont.docker_name)
+                status = "unknown"
+            results.put((cont, status))
+        await asyncio.gather(*(resolve(cont) for cont in pending))
+    docker_async.submit(resolve_all())
+
+    pending_ids = {cont.id for cont in pending}
+    waiting = {group.id: group.member_ids & pending_ids for group in groups if group.member_ids & pending_ids}
+    for _ in pending:
+        cont, status = results.get()
+        statuses[cont.id] = status
+        yield 'container', {'container_id': cont.id, 'status': status}
+        for group in groups:
+            members = waiting.get(group.id)
+            if members is None or cont.id not in members:
+                continue
+            members = waiting[group.id] = members - {cont.id}
+            if not members:
+                del waiting[group.id]
+                gc_status = {gc.container.id: statuses[gc.container.id] for gc in group.group_containers}
+                running = sum(1 for st in gc_status.values() if st == 'running')
+                yield 'group', {'group_id': group.id, 'status': f"{running}/{len(gc_status)}",
+                                'container_statuses': gc_status}
+
 @app.route('/')
 @login_required
 def index():
-    if current_user.role == 'admin':
-        all_containers = Container.query.order_by(Container.order_index).all()
-        individual_containers = [c for c in all_containers if len(c.group_assocs) == 0]
-        groups = Group.query.order_by(Group.order_index).all()
-    else:
-        allowed_containers = current_user.containers
-        all_groups = Group.query.join(Group.group_containers).filter(
-            GroupContainer.container_id.in_([c.id for c in allowed_containers])
-        ).all()
-        full_groups = [g for g in all_groups if all(gc.container in allowed_containers for gc in g.group_containers.all())]
-        union_full = set()
-        for g in full_groups:
-            for gc in g.group_containers.all():
-                union_full.add(gc.container)
-        individual_containers = sorted([c for c in allowed_containers if c not in union_full], key=lambda x: x.order_index)
-        groups = full_groups
-
-    container_status = {}
-    for cont in individual_containers:
-        try:
-            docker_cont = client.containers.get(cont.docker_name)
-            status = docker_cont.status
-        except docker.errors.NotFound:
-            status = "not found"
-        container_status[cont.id] = status
+    for target_name, action, errors in job_manager.collect_notifications(current_user.id):
+        for message in errors:
+            flash(f"{message}.", "danger")
+    individual_containers, groups = dashboard_layout(current_user)
 
+    # Status aus dem Cache übernehmen; was dort fehlt, wird erst nach dem Layout nachgeliefert
+    containers = {c.id: c for c in individual_containers}
+    for group in groups:
+        for gc in group.group_containers:
+            containers[gc.container.id] = gc.container
+    statuses = {cid: docker_hosts.get(c.host_id).status_cache.cached(c.docker_name, c.docker_id)
+                for cid, c in containers.items()}
+    pending = [containers[cid] for cid, st in statuses.items() if st is None]
+
+    container_status = {c.id: statuses[c.id] or STATUS_PENDING for c in individual_containers}
     group_status = {}
     group_container_status = {}
     for group in groups:
-        total = len(group.group_containers)
-        running = 0
-        gc_status = {}
-        for gc in sorted(group.group_containers, key=lambda x: x.startup_order):
-            try:
-                docker_cont = client.containers.get(gc.container.docker_name)
-                st = docker_cont.status
-                if st == 'running':
-                    running += 1
-            except docker.errors.NotFound:
-                st = "not found"
-            gc_status[gc.container.id] = st
-        group_status[group.id] = f"{running}/{total}"
+        gc_status = {gc.container.id: statuses[gc.container.id] or STATUS_PENDING for gc in group.group_containers}
+        running = sum(1 for st in gc_status.values() if st == 'running')
+        if STATUS_PENDING in gc_status.values():
+            group_status[group.id] = STATUS_PENDING
+        else:
+            group_status[group.id] = f"{running}/{len(group.group_containers)}"
         group_container_status[group.id] = gc_status
 
-    return render_template('index.html',
-                           individual_containers=individual_containers,
-                           groups=groups,
-                           container_status=container_status,
-                           group_status=group_status,
-                           group_container_status=group_container_status)
+    # Flash-Nachrichten vor dem Streamen abholen: danach ist das Session-Cookie schon gesendet
+    context = dict(flashed_messages=get_flashed_messages(with_categories=True),
+                   individual_containers=individual_containers,
+                   groups=groups,
+                   host_names={host.id: host.name for host in config_store.get().hosts.values()},
+                   container_status=container_status,
+                   container_stats={c.id: stats_sampler.current(c.id) for c in individual_containers},
+                   stats_enabled=stats_sampler.enabled,
+                   group_status=group_status,
+                   group_container_status=group_container_status,
+                   status_pending=STATUS_PENDING,
+                   status_stale=status_is_stale(containers.values()))
+    if not pending:
+        return render_template('index.html', status_updates=(), **context)
+    # Layout sofort senden, fehlende Status als <script>-Schnipsel streamen, sobald sie vorliegen
+    return stream_template('index.html', status_updates=dashboard_status_updates(pending, groups, statuses), **context)
 
 @app.route('/control', methods=['POST'])
 @login_required
 def control_view():
     cont_id = request.form.get('container_id')
     action = request.form.get('action')
-    cont = Container.query.get(cont_id)
-    if cont:
-        try:
-            docker_cont = client.containers.get(cont.docker_name)
-            if action == "start":
-                docker_cont.start()
-            elif action == "stop":
-                docker_cont.stop()
-        except docker.errors.NotFound:
-            flash(f"Container {cont.docker_name} not found.", "danger")
+    snapshot = config_store.get()
+    cont = snapshot.containers.get(parse_id(cont_id))
+    if cont and current_user.role != 'admin' and cont.id not in snapshot.allowed_ids(current_user.id):
+        flash("Access denied to this container.", "danger")
+        cont = None
+    if cont and action in ("start", "stop"):
+        plan = container_plan(cont)
+        queue_job_flash(cont.display_name, 'container', cont.id, action, plan)
     return redirect(url_for('index'))
 
 @app.route('/control_group', methods=['POST'])
@@ -366,22 +4082,31 @@ def control_view():
 def control_group_view():
     group_id = request.form.get('group_id')
     action = request.form.get('action')
-    group = Group.query.get(group_id)
-    if group:
-        for gc in sorted(group.group_containers, key=lambda x: x.startup_order):
-            try:
-                docker_cont = client.containers.get(gc.container.docker_name)
-                if action == "start":
-                    docker_cont.start()
-                    if gc.delay:
-                        time.sleep(gc.delay)
-                elif action == "stop":
-                    docker_cont.stop()
-            except docker.errors.NotFound:
-                flash(f"Container {gc.container.docker_name} not found.", "danger")
+    snapshot = config_store.get()
+    group = snapshot.groups.get(parse_id(group_id))
+    if group and current_user.role != 'admin' and not group.member_ids <= snapshot.allowed_ids(current_user.id):
+        flash("Access denied to this group.", "danger")
+        group = None
+    if group and action in ("start", "stop"):
+        queue_job_flash(group.name, 'group', group.id, action, build_group_plan(group))
     return redirect(url_for('index'))
 
+def queue_job_flash(target_name, target_type, target_id, action, plan):
+    try:
+        job, created = job_manager.submit(current_user.id, target_type, target_id, target_name, action, plan,
+                                          notify=True, source='ui', username=current_user.username)
+    except JobQueueFull:
+        flash("Too many queued jobs, please try again later.", "danger")
+        return
+    if created:
+        flash(f"{action.capitalize()} of {target_name} queued.", "info")
+    else:
+        flash(f"A {job['action']} job for {target_name} is already running.", "warning")
+
 # --- Container Management ---
+def host_choices():
+    return [(0, 'Local')] + [(h.id, h.name) for h in DockerHost.query.order_by(DockerHost.name).all()]
+
 @app.route('/container/new', methods=['GET', 'POST'])
 @login_required
 def new_container_view():
@@ -389,21 +4114,22 @@ def new_container_view():
         flash("Only admins can create containers.", "danger")
         return redirect(url_for('index'))
     form = ContainerForm()
+    form.host_id.choices = host_choices()
     if form.validate_on_submit():
         icon_filename = None
         if form.icon.data:
-            file = form.icon.data
-            filename = secure_filename(file.filename)
-            upload_folder = app.config['UPLOAD_FOLDER']
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            file.save(os.path.join(upload_folder, filename))
-            icon_filename = f'icons/{filename}'
+            try:
+                icon_filename = save_icon(form.icon.data)
+            except ValueError as e:
+                flash(str(e), "danger")
+                return render_template('new_container.html', form=form)
         container = Container(
             name=form.name.data,
             display_name=form.display_name.data,
             docker_name=form.docker_name.data,
-            icon=icon_filename
+            host_id=form.host_id.data or None,
+            icon=icon_filename,
+            idle_timeout=form.idle_timeout.data
         )
         db.session.add(container)
         try:
@@ -426,19 +4152,27 @@ def edit_container_view(container_id):
         flash('Container not found.', "danger")
         return redirect(url_for('index'))
     form = ContainerForm(obj=cont)
+    form.host_id.choices = host_choices()
+    if request.method == 'GET':
+        form.host_id.data = cont.host_id or 0
     if form.validate_on_submit():
         cont.name = form.name.data
         cont.display_name = form.display_name.data
-        cont.docker_name = form.docker_name.data
+        if cont.docker_name != form.docker_name.data or cont.host_id != (form.host_id.data or None):
+            cont.docker_name = form.docker_name.data
+            cont.host_id = form.host_id.data or None
+            cont.docker_id = None   # wird vom Reconciler neu aufgelöst
+        cont.idle_timeout = form.idle_timeout.data
+        old_icon = None
         if form.icon.data:
-            file = form.icon.data
-            filename = secure_filename(file.filename)
-            upload_folder = app.config['UPLOAD_FOLDER']
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            file.save(os.path.join(upload_folder, filename))
-            cont.icon = f'icons/{filename}'
+            try:
+                old_icon, cont.icon = cont.icon, save_icon(form.icon.data)
+            except ValueError as e:
+                flash(str(e), "danger")
+                return render_template('edit_container.html', form=form, container=cont)
         db.session.commit()
+        if old_icon and old_icon != cont.icon:
+            remove_unused_icon(old_icon)
         flash('Container updated.', "success")
         return redirect(url_for('index'))
     return render_template('edit_container.html', form=form, container=cont)
@@ -453,6 +4187,7 @@ def delete_container_view(container_id):
     if cont:
         db.session.delete(cont)
         db.session.commit()
+        remove_unused_icon(cont.icon)
         flash('Container deleted.', "success")
     return redirect(url_for('index'))
 
@@ -486,15 +4221,13 @@ def new_group_view():
     form = GroupForm()
     form.containers.choices = [(c.id, c.display_name) for c in Container.query.all()]
     if form.validate_on_submit():
-        group = Group(name=form.name.data)
+        group = Group(name=form.name.data, idle_timeout=form.idle_timeout.data)
         if form.icon.data:
-            file = form.icon.data
-            filename = secure_filename(file.filename)
-            upload_folder = app.config['UPLOAD_FOLDER']
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            file.save(os.path.join(upload_folder, filename))
-            group.icon = f'icons/{filename}'
+            try:
+                group.icon = save_icon(form.icon.data)
+            except ValueError as e:
+                flash(str(e), "danger")
+                return render_template('new_group.html', form=form)
         for idx, cont_id in enumerate(form.containers.data):
             container = Container.query.get(cont_id)
             if container:
@@ -516,6 +4249,7 @@ def delete_group_view(group_id):
     if group:
         db.session.delete(group)
         db.session.commit()
+        remove_unused_icon(group.icon)
         flash('Group deleted.', "success")
     return redirect(url_for('index'))
 
@@ -539,6 +4273,15 @@ def group_order_view(group_id):
                 new_delay = gc.delay
             gc.startup_order = new_order
             gc.delay = new_delay
+            ready_check = request.form.get(f'ready_check_{gc.container.id}', gc.ready_check)
+            gc.ready_check = ready_check if ready_check in READY_CHECKS else None
+            gc.ready_target = request.form.get(f'ready_target_{gc.container.id}', gc.ready_target) or None
+            try:
+                gc.ready_timeout = int(request.form.get(f'ready_timeout_{gc.container.id}', gc.ready_timeout))
+            except (ValueError, TypeError):
+                pass
+        idle_timeout = parse_id(request.form.get('idle_timeout'))
+        group.idle_timeout = idle_timeout if idle_timeout and idle_timeout > 0 else None
         db.session.commit()
         flash("Group order updated.", "success")
         return redirect(url_for('index'))
@@ -649,6 +4392,105 @@ def admin_delete_user_view(user_id):
         flash("User not found.", "danger")
     return redirect(url_for('admin_users_view'))
 
+# --- Admin Docker Hosts ---
+@app.route('/admin/hosts', methods=['GET', 'POST'])
+@login_required
+def admin_hosts_view():
+    if current_user.role != 'admin':
+        flash("Access denied.", "danger")
+        return redirect(url_for('index'))
+    form = DockerHostForm()
+    if form.validate_on_submit():
+        url = form.url.data.strip()
+        # Der async Client spricht nur Unix-Sockets und unverschlüsseltes TCP
+        if not url.startswith(('unix://', 'tcp://')):
+            flash("Only unix:// and tcp:// URLs are supported.", "danger")
+        else:
+            db.session.add(DockerHost(name=form.name.data.strip(), url=url, timeout=form.timeout.data))
+            try:
+                db.session.commit()
+                flash("Docker host added.", "success")
+                return redirect(url_for('admin_hosts_view'))
+            except IntegrityError:
+                db.session.rollback()
+                flash("Error: Host name already exists.", "danger")
+    snapshot = config_store.get()
+    container_counts = Counter(c.host_id for c in snapshot.containers.values())
+    hosts = []
+    for backend in docker_hosts.all():
+        hosts.append({'id': backend.host_id, 'name': backend.name, 'url': backend.url or os.environ.get('DOCKER_HOST', 'local socket'),
+                      'timeout': backend.timeout or DOCKER_TIMEOUT, 'available': not backend.breaker.is_open,
+                      'containers': container_counts[backend.host_id]})
+    return render_template('admin_hosts.html', form=form, hosts=hosts)
+
+@app.route('/admin/hosts/delete/<int:host_id>', methods=['POST'])
+@login_required
+def admin_delete_host_view(host_id):
+    if current_user.role != 'admin':
+        flash("Access denied.", "danger")
+        return redirect(url_for('index'))
+    host = DockerHost.query.get(host_id)
+    if not host:
+        flash("Docker host not found.", "danger")
+    elif Container.query.filter_by(host_id=host.id).count():
+        flash("Docker host still has containers, move or delete them first.", "danger")
+    else:
+        db.session.delete(host)
+        db.session.commit()
+        flash("Docker host deleted.", "success")
+    return redirect(url_for('admin_hosts_view'))
+
+# --- Admin Audit Log ---
+@app.route('/admin/audit', methods=['GET'])
+@login_required
+def admin_audit_view():
+    if current_user.role != 'admin':
+        flash("Access denied.", "danger")
+        return redirect(url_for('index'))
+    try:
+        filters = parse_audit_filters(request.args)
+        before = parse_id(request.args.get('before')) if request.args.get('before') else None
+    except ValueError:
+        flash("Invalid filter.", "danger")
+        filters, before = {}, None
+    entries, next_before = query_audit(filters, before)
+    users = dict(db.session.query(User.id, User.username).all())
+    containers = {c.id: c.display_name for c in config_store.get().containers.values()}
+    return render_template('admin_audit.html', entries=entries, next_before=next_before, filters=filters,
+                           users=users, containers=containers)
+
+# ---------------------------
+# Schema upgrades for existing databases
+# ---------------------------
+# db.create_all() legt nur fehlende Tabellen an. Neue Spalten bestehender Tabellen
+# werden hier per ALTER TABLE ergänzt (alle neuen Spalten sind nullable).
+def upgrade_schema():
+    inspector = sa_inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl}'))
+                print(f"Added column {table.name}.{column.name}.")
+    db.session.commit()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+# Alte Klartext-API-Keys in Präfix + Hash umwandeln; die Keys selbst bleiben gültig
+def migrate_api_keys():
+    users = User.query.filter(User.api_key.isnot(None), User.api_key_hash.is_(None)).all()
+    for user in users:
+        set_api_key(user, user.api_key)
+    if users:
+        db.session.commit()
+        print(f"Hashed {len(users)} stored API key(s).")
+    # Frühere Versionen hielten die ersten 12 Zeichen jedes Keys als Suchpräfix im Klartext
+    if 'api_key_prefix' in {col['name'] for col in sa_inspect(db.engine).get_columns('user')}:
+        db.session.execute(text('UPDATE "user" SET api_key_prefix = NULL WHERE api_key_prefix IS NOT NULL'))
+        db.session.commit()
+
 # ---------------------------
 # Create admin user from environment variables (update if exists)
 # ---------------------------
@@ -678,8 +4520,36 @@ def create_admin_from_config():
 # ---------------------------
 # Run the application
 # ---------------------------
-if __name__ == '__main__':
+# Idempotent: fehlende Tabellen, Spalten und Indizes sowie alte Klartext-API-Keys
+def migrate_database():
+    db.create_all()
+    upgrade_schema()
+    migrate_api_keys()
+
+# Einmalige DB-Initialisierung vor dem ersten Request (Gunicorn-Master vor dem Forken bzw.
+# prepare_app()). Ist die Datenbank noch nicht erreichbar, holen die Prozesse sie im Hintergrund nach.
+def initialize_database():
+    startup.init_database()
+    with app.app_context():
+        db.engine.dispose()
+
+# Start für den Entwicklungsserver und andere WSGI-Server: Migrationen und Hintergrundstart,
+# danach die (beim Import angelegte) App. Gunicorn nutzt stattdessen die Hooks in
+# gunicorn.conf.py, damit im Master vor dem Forken keine Threads laufen.
+def prepare_app():
+    initialize_database()
+    startup.start_background()
+    return app
+
+# Nach dem Forken eines Worker-Prozesses: keine Sockets/Verbindungen des Masters weiterverwenden
+def reset_after_fork():
+    docker_hosts.reset()
+    audit_log.reset()
+    status_inflight.reset()
+    control_coordinator.reset()
+    stats_sampler.reset()
     with app.app_context():
-        db.create_all()
-        create_admin_from_config()
-    app.run(host='0.0.0.0', port=5000)
+        db.engine.dispose(close=False)
+
+if __name__ == '__main__':
+    prepare_app().run(host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,327 @@
+# Fake Docker Engine API für Lasttests
+#
+# Lauscht auf einem Unix-Socket und simuliert N Container (bench-0000, bench-0001, ...)
+# mit einstellbarer Latenz pro Operation, zufälligen Fehlern und Event-Erzeugung.
+# Beantwortet nur die Endpunkte, die der Docker-Controller benutzt:
+#   /_ping, /version, /containers/json, /containers/<id>/{json,start,stop,restart,logs,stats}, /events
+# Zusätzlich für das Benchmark-Skript:
+#   GET  /_fake/stats   Aufrufe pro Operation seit dem letzten Reset
+#   POST /_fake/reset   Zähler zurücksetzen
+#
+# Aufruf: python bench/fake_dockerd.py --socket /tmp/fake-docker.sock --containers 200 \
+#             --latency inspect=0.002 --latency start=0.05 --failure-rate 0.01 --event-rate 5
+import argparse
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import signal
+import socketserver
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+API_VERSION = '1.41'
+DEFAULT_LATENCY = {'ping': 0, 'version': 0, 'list': 0.005, 'inspect': 0.002,
+                   'start': 0.05, 'stop': 0.1, 'restart': 0.15, 'logs': 0.002, 'stats': 0.01, 'events': 0}
+FAILING_OPS = ('list', 'inspect', 'start', 'stop', 'restart', 'logs', 'stats')
+CONTAINER_OP = re.compile(r'^/containers/([^/]+)/(json|start|stop|restart|logs|stats)$')
+LOG_LINE = b'bench container ready\n'
+
+
+class FakeDocker:
+    def __init__(self, count, latency, failure_rate, running_ratio, label_groups):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.subscribers = []
+        self.containers = {}
+        self.by_name = {}
+        for i in range(count):
+            name = f'bench-{i:04d}'
+            labels = {}
+            if label_groups:
+                labels = {'docker-controller.group': f'bench-group-{i % label_groups:02d}',
+                          'docker-controller.order': str(i % 3)}
+            self._add(name, random.random() < running_ratio, labels)
+
+    def _add(self, name, running, labels):
+        cont_id = hashlib.sha256(name.encode()).hexdigest()
+        self.containers[cont_id] = {
+            'Id': cont_id,
+            'Name': '/' + name,
+            'Created': '2024-01-01T00:00:00Z',
+            'State': self._state(running),
+            'Config': {'Image': 'bench:latest', 'Tty': False, 'Labels': labels},
+            'NetworkSettings': {'Networks': {'bridge': {'IPAddress': '127.0.0.1'}}},
+        }
+        self.by_name[name] = cont_id
+
+    @staticmethod
+    def _state(running):
+        return {'Status': 'running' if running else 'exited', 'Running': running, 'ExitCode': 0}
+
+    def find(self, ref):
+        cont_id = self.by_name.get(ref, ref)
+        container = self.containers.get(cont_id)
+        if container is None and len(ref) >= 12:
+            container = next((c for i, c in self.containers.items() if i.startswith(ref)), None)
+        return container
+
+    # Zählt den Aufruf, wartet die konfigurierte Latenz ab und würfelt einen Fehler aus
+    def enter(self, op):
+        with self.lock:
+            self.calls[op] += 1
+        delay = self.latency.get(op, 0)
+        if delay:
+            time.sleep(delay)
+        return op in FAILING_OPS and self.failure_rate and random.random() < self.failure_rate
+
+    def set_running(self, container, running):
+        with self.lock:
+            if container['State']['Running'] == running:
+                return False
+            container['State'] = self._state(running)
+        self.emit('start' if running else 'die', container)
+        if not running:
+            self.emit('stop', container)
+        return True
+
+    # Wachsende Zähler wie bei "docker stats --no-stream" (one-shot: ohne precpu_stats)
+    def container_stats(self, container):
+        now = time.time()
+        running = container['State']['Running']
+        seed = int(container['Id'][:8], 16) % 100
+        total = int(now * 1e7 * (seed % 8 + 1)) if running else 0
+        return {
+            'read': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)),
+            'cpu_stats': {'cpu_usage': {'total_usage': total}, 'system_cpu_usage': int(now * 1e9 * 4),
+                          'online_cpus': 4},
+            'precpu_stats': {'cpu_usage': {'total_usage': 0}},
+            'memory_stats': {'usage': (seed + 20) * 2 ** 20 if running else 0, 'limit': 8 * 2 ** 30,
+                             'stats': {'inactive_file': 4 * 2 ** 20 if running else 0}},
+            'networks': {'eth0': {'rx_bytes': int(now * 1000) % 2 ** 40, 'tx_bytes': int(now * 500) % 2 ** 40}},
+            'blkio_stats': {'io_service_bytes_recursive': [
+                {'major': 8, 'minor': 0, 'op': 'read', 'value': int(now * 100) % 2 ** 40},
+                {'major': 8, 'minor': 0, 'op': 'write', 'value': int(now * 200) % 2 ** 40}]},
+        }
+
+    def emit(self, action, container):
+        attrs = dict(container['Config']['Labels'])
+        attrs['name'] = container['Name'].lstrip('/')
+        event = {'Type': 'container', 'Action': action, 'status': action, 'id': container['Id'],
+                 'from': container['Config']['Image'],
+                 'Actor': {'ID': container['Id'], 'Attributes': attrs},
+                 'time': int(time.time()), 'timeNano': time.time_ns()}
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            sub.put(event)
+
+    def stats(self):
+        with self.lock:
+            calls = dict(self.calls)
+            subscribers = len(self.subscribers)
+        return {'calls': calls, 'total': sum(calls.values()), 'event_subscribers': subscribers}
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+
+    # Zufällige Statuswechsel, damit der Events-Stream unter Last Arbeit bekommt
+    def churn(self, rate, stop):
+        names = list(self.by_name)
+        while names and not stop.wait(1 / rate):
+            container = self.containers[self.by_name[random.choice(names)]]
+            self.set_running(container, not container['State']['Running'])
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'fake-dockerd'
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return 'unix'
+
+    def send(self, code, payload=None, body=None, content_type='application/json'):
+        if body is None:
+            body = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(code)
+        self.send_header('Api-Version', API_VERSION)
+        if code not in (204, 304):
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if code not in (204, 304):
+            self.wfile.write(body)
+
+    def error(self, code, message):
+        self.send(code, {'message': message})
+
+    def start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Api-Version', API_VERSION)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+    def do_HEAD(self):
+        self.route('HEAD')
+
+    def route(self, method):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        path = re.sub(r'^/v[\d.]+', '', url.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        if path == '/_fake/stats':
+            return self.send(200, fake.stats())
+        if path == '/_fake/reset':
+            fake.reset()
+            return self.send(204)
+        if path == '/_ping':
+            fake.enter('ping')
+            return self.send(200, body=b'OK', content_type='text/plain')
+        if path == '/version':
+            fake.enter('version')
+            return self.send(200, {'ApiVersion': API_VERSION, 'MinAPIVersion': '1.12', 'Version': 'fake'})
+        if path == '/containers/json':
+            if fake.enter('list'):
+                return self.error(500, 'fake failure')
+            show_all = params.get('all', ['0'])[0] in ('1', 'true')
+            return self.send(200, [
+                {'Id': c['Id'], 'Names': [c['Name']], 'Image': c['Config']['Image'],
+                 'State': c['State']['Status'], 'Labels': c['Config']['Labels']}
+                for c in list(fake.containers.values()) if show_all or c['State']['Running']])
+        if path == '/events':
+            fake.enter('events')
+            return self.events(fake, params)
+
+        match = CONTAINER_OP.match(path)
+        if not match:
+            return self.error(404, 'page not found')
+        ref, op = match.groups()
+        op = 'inspect' if op == 'json' else op
+        failed = fake.enter(op)
+        container = fake.find(ref)
+        if container is None:
+            return self.error(404, f'No such container: {ref}')
+        if failed:
+            return self.error(500, 'fake failure')
+        if op == 'inspect':
+            return self.send(200, container)
+        if op == 'logs':
+            frame = bytes([1, 0, 0, 0]) + len(LOG_LINE).to_bytes(4, 'big') + LOG_LINE
+            self.start_chunked('application/vnd.docker.raw-stream')
+            self.chunk(frame)
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if op == 'stats':
+            return self.send(200, fake.container_stats(container))
+        if op == 'restart':
+            fake.set_running(container, False)
+            fake.set_running(container, True)
+            return self.send(204)
+        changed = fake.set_running(container, op == 'start')
+        return self.send(204 if changed else 304)
+
+    # Streamt Events bis "until" (oder bis der Client trennt)
+    def events(self, fake, params):
+        until = float(params['until'][0]) if 'until' in params else None
+        sub = queue.Queue()
+        with fake.lock:
+            fake.subscribers.append(sub)
+        try:
+            self.start_chunked('application/json')
+            self.wfile.flush()
+            while until is None or time.time() < until:
+                try:
+                    event = sub.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                self.chunk(json.dumps(event).encode() + b'\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            pass
+        finally:
+            with fake.lock:
+                fake.subscribers.remove(sub)
+        self.close_connection = True
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def parse_latency(values):
+    latency = dict(DEFAULT_LATENCY)
+    for value in values:
+        op, _, seconds = value.partition('=')
+        if op not in latency:
+            raise argparse.ArgumentTypeError(f'unknown operation {op!r} (choose from {", ".join(latency)})')
+        latency[op] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Docker Engine API on a unix socket')
+    parser.add_argument('--socket', default='/tmp/fake-docker.sock')
+    parser.add_argument('--containers', type=int, default=50, help='number of simulated containers')
+    parser.add_argument('--latency', action='append', default=[], metavar='OP=SECONDS',
+                        help=f'per-operation latency, ops: {", ".join(DEFAULT_LATENCY)}')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='probability (0-1) that list/inspect/start/stop/logs/stats return a 500')
+    parser.add_argument('--event-rate', type=float, default=0.0,
+                        help='random status changes (and events) per second')
+    parser.add_argument('--running', type=float, default=0.5, help='share of containers running at start')
+    parser.add_argument('--label-groups', type=int, default=0,
+                        help='add docker-controller.* labels spreading the containers over this many groups')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fake = FakeDocker(args.containers, parse_latency(args.latency), args.failure_rate,
+                      args.running, args.label_groups)
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = Server(args.socket, Handler)
+    server.fake = fake
+    stop = threading.Event()
+    if args.event_rate > 0:
+        threading.Thread(target=fake.churn, args=(args.event_rate, stop), daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f'fake dockerd: {args.containers} containers on {args.socket}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
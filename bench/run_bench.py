@@ -0,0 +1,416 @@
+# Lasttest für den Docker-Controller
+#
+# Startet pro Kombination aus Benutzer-, Container- und Gruppenanzahl einen Fake-Docker-Daemon
+# (bench/fake_dockerd.py), legt eine frische Datenbank in einem temporären Verzeichnis an,
+# startet die App (Werkzeug oder Gunicorn) und treibt die Szenarien mit parallelen Clients:
+#   status          GET  /api/status
+#   group_status    GET  /api/group_status
+#   control_group   POST /api/control_group (abwechselnd start/stop)
+#   dashboard       GET  / (eingeloggte Sitzung)
+# Ausgabe pro Szenario: Durchsatz, p50/p95/p99-Latenz und Docker-API-Aufrufe pro Request
+# (gezählt vom Fake-Daemon, Events-Abos ausgenommen).
+#
+# Beispiel: python bench/run_bench.py --users 1,20 --containers 20,200 --groups 2,20 --duration 10
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SCENARIOS = ('status', 'group_status', 'control_group', 'dashboard')
+PASSWORD = 'bench-password'
+CSRF_FIELD = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+# ---------------------------
+# Fake-Daemon
+# ---------------------------
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def daemon_request(socket_path, method, path):
+    conn = UnixConnection(socket_path)
+    try:
+        conn.request(method, path)
+        resp = conn.getresponse()
+        body = resp.read()
+        return json.loads(body) if body else None
+    finally:
+        conn.close()
+
+
+def docker_calls(socket_path):
+    stats = daemon_request(socket_path, 'GET', '/_fake/stats')
+    return stats['total'] - stats['calls'].get('events', 0)
+
+
+def start_fake_daemon(args, socket_path, containers, log):
+    cmd = [sys.executable, os.path.join(BENCH_DIR, 'fake_dockerd.py'), '--socket', socket_path,
+           '--containers', str(containers), '--failure-rate', str(args.failure_rate),
+           '--event-rate', str(args.event_rate), '--seed', str(args.seed)]
+    for value in args.latency:
+        cmd += ['--latency', value]
+    proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('fake dockerd exited, see log')
+        try:
+            daemon_request(socket_path, 'GET', '/_fake/stats')
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('fake dockerd did not start')
+
+
+# ---------------------------
+# App-Setup und -Server
+# ---------------------------
+def app_env(args, data_dir, socket_path):
+    env = dict(os.environ)
+    env.update({
+        'DATA_DIR': data_dir,
+        'DATABASE_URL': 'sqlite:///' + os.path.join(data_dir, 'bench.db'),
+        'DOCKER_HOST': 'unix://' + socket_path,
+        'LABEL_DISCOVERY': '0',
+        'WEB_WORKERS': str(args.workers),
+        'WEB_THREADS': str(args.threads),
+        'WEB_ACCESS_LOG': os.devnull,
+        'PYTHONPATH': ROOT + os.pathsep + env.get('PYTHONPATH', ''),
+    })
+    return env
+
+
+# Läuft als Unterprozess mit app_env(): legt Benutzer, Container und Gruppen an
+def setup_database(users, containers, groups):
+    from app import Container, Group, GroupContainer, User, app, db, initialize_database, set_api_key
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        db.create_all()
+        rows = [Container(name=f'bench-{i:04d}', display_name=f'Bench {i}', docker_name=f'bench-{i:04d}',
+                          order_index=i) for i in range(containers)]
+        db.session.add_all(rows)
+        group_rows = [Group(name=f'bench-group-{i:02d}', order_index=i) for i in range(groups)]
+        db.session.add_all(group_rows)
+        if group_rows:
+            # Container reihum auf die Gruppen verteilen, in drei Startreihenfolge-Stufen
+            for i, container in enumerate(rows):
+                db.session.add(GroupContainer(group=group_rows[i % groups], container=container,
+                                              startup_order=(i // groups) % 3, delay=0))
+        password_hash = generate_password_hash(PASSWORD)
+        api_keys = []
+        for i in range(users):
+            user = User(username=f'bench-user-{i:03d}', password_hash=password_hash, role='user')
+            user.containers = list(rows)
+            api_key = f'bench-key-{i:03d}-' + os.urandom(8).hex()
+            set_api_key(user, api_key)
+            api_keys.append(api_key)
+            db.session.add(user)
+        db.session.commit()
+        result = {
+            'usernames': [f'bench-user-{i:03d}' for i in range(users)],
+            'api_keys': api_keys,
+            'container_ids': [c.id for c in rows],
+            'group_ids': [g.id for g in group_rows],
+        }
+        db.session.remove()
+    initialize_database()
+    return result
+
+
+def serve(port):
+    from werkzeug.serving import make_server
+    from app import prepare_app
+    make_server('127.0.0.1', port, prepare_app(), threaded=True).serve_forever()
+
+
+def start_app_server(args, env, port, log):
+    if args.server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+               '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), 'serve', '--port', str(port)]
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    # Kaltstart messen: erst /readyz, dann die erste echte Seite
+    timings = {}
+    deadline = started + 30
+    for name, path in (('ready', '/readyz'), ('first_request', '/login_view')):
+        while name not in timings:
+            if proc.poll() is not None:
+                raise RuntimeError('app server exited, see log')
+            if time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError('app server did not start')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                conn.request('GET', path)
+                if conn.getresponse().status == 200:
+                    timings[name] = (time.monotonic() - started) * 1000
+                conn.close()
+            except OSError:
+                pass
+            if name not in timings:
+                time.sleep(0.01)
+    print(f"  cold start: ready after {timings['ready']:.0f} ms, first page after {timings['first_request']:.0f} ms",
+          file=sys.stderr, flush=True)
+    return proc
+
+
+def stop_process(proc):
+    if proc and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def login(port, username):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', '/login_view')
+        resp = conn.getresponse()
+        page = resp.read().decode()
+        cookie = (resp.getheader('Set-Cookie') or '').split(';')[0]
+        token = CSRF_FIELD.search(page).group(1)
+        form = urlencode({'csrf_token': token, 'username': username, 'password': PASSWORD, 'submit': 'Login'})
+        conn.request('POST', '/login_view', body=form, headers={
+            'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status != 302:
+            raise RuntimeError(f'login for {username} failed ({resp.status})')
+        return (resp.getheader('Set-Cookie') or cookie).split(';')[0]
+    finally:
+        conn.close()
+
+
+# ---------------------------
+# Szenarien
+# ---------------------------
+# Jede Funktion liefert (Methode, Pfad, Body, Header) für einen zufälligen Benutzer/Container/Gruppe
+def request_status(ctx, rng):
+    query = urlencode({'api_key': rng.choice(ctx['api_keys']), 'container_id': rng.choice(ctx['container_ids'])})
+    return 'GET', f'/api/status?{query}', None, {}
+
+
+def request_group_status(ctx, rng):
+    query = urlencode({'api_key': rng.choice(ctx['api_keys']), 'group_id': rng.choice(ctx['group_ids'])})
+    return 'GET', f'/api/group_status?{query}', None, {}
+
+
+def request_control_group(ctx, rng):
+    body = json.dumps({'api_key': rng.choice(ctx['api_keys']), 'group_id': rng.choice(ctx['group_ids']),
+                       'action': rng.choice(('start', 'stop'))})
+    return 'POST', '/api/control_group', body, {'Content-Type': 'application/json'}
+
+
+def request_dashboard(ctx, rng):
+    return 'GET', '/', None, {'Cookie': rng.choice(ctx['cookies'])}
+
+
+REQUESTS = {
+    'status': request_status,
+    'group_status': request_group_status,
+    'control_group': request_control_group,
+    'dashboard': request_dashboard,
+}
+
+
+def load_worker(port, make_request, ctx, seed, deadline, samples):
+    rng = random.Random(seed)
+    conn = None
+    while time.monotonic() < deadline:
+        method, path, body, headers = make_request(ctx, rng)
+        started = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+            if conn is not None:
+                conn.close()
+            conn = None
+        samples.append((time.perf_counter() - started, ok))
+    if conn is not None:
+        conn.close()
+
+
+def run_scenario(args, port, socket_path, name, ctx, duration):
+    threads = []
+    per_thread = [[] for _ in range(args.concurrency)]
+    calls_before = docker_calls(socket_path)
+    started = time.monotonic()
+    deadline = started + duration
+    for i, samples in enumerate(per_thread):
+        thread = threading.Thread(target=load_worker, args=(port, REQUESTS[name], ctx, args.seed + i, deadline, samples))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    calls = docker_calls(socket_path) - calls_before
+    samples = [s for chunk in per_thread for s in chunk]
+    latencies = sorted(s[0] for s in samples)
+    count = len(samples)
+    return {
+        'scenario': name,
+        'requests': count,
+        'errors': sum(1 for s in samples if not s[1]),
+        'throughput': count / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'docker_calls_per_request': calls / count if count else 0.0,
+    }
+
+
+# ---------------------------
+# Ablauf
+# ---------------------------
+HEADER = (f"{'users':>5} {'conts':>5} {'groups':>6}  {'scenario':<14} {'requests':>8} {'errors':>6} "
+          f"{'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'docker/req':>10}")
+
+
+def format_row(result):
+    return (f"{result['users']:>5} {result['containers']:>5} {result['groups']:>6}  {result['scenario']:<14} "
+            f"{result['requests']:>8} {result['errors']:>6} {result['throughput']:>8.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+            f"{result['docker_calls_per_request']:>10.2f}")
+
+
+def run_combination(args, users, containers, groups):
+    work_dir = tempfile.mkdtemp(prefix='docker-controller-bench-')
+    socket_path = os.path.join(work_dir, 'docker.sock')
+    env = app_env(args, work_dir, socket_path)
+    daemon = server = None
+    results = []
+    with open(os.path.join(work_dir, 'daemon.log'), 'w') as daemon_log, \
+            open(os.path.join(work_dir, 'server.log'), 'w') as server_log:
+        try:
+            daemon = start_fake_daemon(args, socket_path, containers, daemon_log)
+            setup = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), 'setup', '--users', str(users),
+                 '--containers', str(containers), '--groups', str(groups)],
+                cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+            ctx = json.loads(setup.stdout.strip().splitlines()[-1])
+            port = free_port()
+            server = start_app_server(args, env, port, server_log)
+            if 'dashboard' in args.scenarios:
+                ctx['cookies'] = [login(port, username) for username in ctx['usernames']]
+            for name in args.scenarios:
+                if name in ('group_status', 'control_group') and not ctx['group_ids']:
+                    continue
+                if args.warmup:
+                    run_scenario(args, port, socket_path, name, ctx, args.warmup)
+                result = run_scenario(args, port, socket_path, name, ctx, args.duration)
+                result.update(users=users, containers=containers, groups=groups)
+                print(format_row(result), flush=True)
+                results.append(result)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f'database setup failed:\n{e.stderr}') from e
+        finally:
+            stop_process(server)
+            stop_process(daemon)
+    if args.keep:
+        print(f'  logs and database kept in {work_dir}', file=sys.stderr)
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Docker Controller against a fake Docker daemon')
+    sub = parser.add_subparsers(dest='command')
+    setup = sub.add_parser('setup', help=argparse.SUPPRESS)
+    setup.add_argument('--users', type=int, required=True)
+    setup.add_argument('--containers', type=int, required=True)
+    setup.add_argument('--groups', type=int, required=True)
+    serve_cmd = sub.add_parser('serve', help=argparse.SUPPRESS)
+    serve_cmd.add_argument('--port', type=int, required=True)
+
+    parser.add_argument('--users', type=int_list, default=[1, 10], help='comma separated user counts')
+    parser.add_argument('--containers', type=int_list, default=[20, 200], help='comma separated container counts')
+    parser.add_argument('--groups', type=int_list, default=[2, 20], help='comma separated group counts')
+    parser.add_argument('--scenarios', type=lambda v: v.split(','), default=list(SCENARIOS),
+                        help=f'comma separated, from {",".join(SCENARIOS)}')
+    parser.add_argument('--concurrency', type=int, default=16, help='parallel clients per scenario')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=2, help='seconds of unmeasured load before each scenario')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=16, help='gunicorn threads per worker')
+    parser.add_argument('--latency', action='append', default=[], metavar='OP=SECONDS',
+                        help='passed to fake_dockerd.py (e.g. inspect=0.002, start=0.05, stop=0.1)')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--event-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='FILE', help='also write all results as JSON')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary data directory and logs')
+    args = parser.parse_args()
+
+    if args.command == 'setup':
+        print(json.dumps(setup_database(args.users, args.containers, args.groups)))
+        return
+    if args.command == 'serve':
+        serve(args.port)
+        return
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    print(HEADER, flush=True)
+    results = []
+    for users, containers, groups in itertools.product(args.users, args.containers, args.groups):
+        results += run_combination(args, users, containers, groups)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
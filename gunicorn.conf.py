@@ -0,0 +1,55 @@
+# Gunicorn-Konfiguration für den Produktivbetrieb (alle Werte per Umgebungsvariable einstellbar)
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Worker-Prozesse und Threads pro Worker. "gthread" (Standard) bedient mehrere Requests
+# pro Prozess mit Threads; "gevent" nutzt Green-Threads (erfordert "pip install gevent").
+workers = int(os.environ.get('WEB_WORKERS', min(multiprocessing.cpu_count(), 4)))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('WEB_THREADS', 16))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 1000))  # nur gevent
+
+# gevent muss patchen, bevor die App (preload_app) Locks, Threads und Sockets anlegt;
+# sonst blockiert ein wartender SSE-Stream den ganzen Worker statt nur seinen Greenlet
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+# Lange Docker-Stops und SSE-Streams dürfen einen Worker nicht als hängend markieren
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Optional Worker nach N Requests neu starten (0 = aus), mit Jitter gegen gleichzeitige Neustarts
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 50))
+
+# App einmal im Master laden; Worker werden per fork() erzeugt. Graceful Reload per SIGHUP.
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Jobs mehrerer Worker teilen sich ihren Zustand über das data-Verzeichnis
+if workers > 1:
+    os.environ.setdefault('JOB_STATE_DIR', os.path.join(
+        os.environ.get('DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'), 'jobs'))
+
+
+def on_starting(server):
+    # Migrationen genau einmal im Master, nicht pro Worker (scheitern sie, holen die Worker sie nach)
+    from app import initialize_database
+    initialize_database()
+
+
+def post_fork(server, worker):
+    from app import reset_after_fork
+    reset_after_fork()
+
+
+def post_worker_init(worker):
+    # Admin-Abgleich und Aufwärmen der Docker-Status-Caches im Hintergrund; der Worker nimmt sofort Requests an
+    from app import startup
+    startup.start_background()
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# app.py liest seine Konfiguration beim Import: Daten und Datenbank in ein temporäres
+# Verzeichnis, ein Docker-Socket, den es nicht gibt, und keine Hintergrund-Sampler.
+TEST_DATA_DIR = tempfile.mkdtemp(prefix='docker-controller-tests-')
+os.environ.update(
+    DATA_DIR=TEST_DATA_DIR,
+    DATABASE_URL=f'sqlite:///{TEST_DATA_DIR}/test.db',
+    DOCKER_HOST=f'unix://{TEST_DATA_DIR}/docker.sock',
+    STATS_INTERVAL='0',
+    LABEL_DISCOVERY='0',
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,69 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import (User, api_auth_cache, app, db, generate_api_key, hash_api_key, migrate_api_keys, set_api_key,
+                 verify_api_key)
+
+LEGACY_KEY = '0123456789abcdef0123456789abcdef'
+
+
+@pytest.fixture
+def database():
+    with app.app_context():
+        db.create_all()
+        api_auth_cache.invalidate()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+def add_user(username, **columns):
+    user = User(username=username, password_hash=generate_password_hash('pw'), role='user', **columns)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_migration_hashes_legacy_plaintext_keys(database):
+    user = add_user('legacy', api_key=LEGACY_KEY)
+    migrate_api_keys()
+    assert user.api_key is None
+    assert user.api_key_id is None
+    assert user.api_key_hash == hash_api_key(LEGACY_KEY)
+    assert verify_api_key(LEGACY_KEY).username == 'legacy'
+    assert verify_api_key(LEGACY_KEY[:-1] + '0') is None
+
+
+def test_migration_leaves_hashed_keys_alone(database):
+    user = add_user('hashed')
+    key = generate_api_key()
+    set_api_key(user, key)
+    db.session.commit()
+    migrate_api_keys()
+    assert user.api_key_hash == hash_api_key(key)
+    assert verify_api_key(key).username == 'hashed'
+
+
+def test_new_keys_are_looked_up_by_their_id(database):
+    user = add_user('alice')
+    key = generate_api_key()
+    set_api_key(user, key)
+    db.session.commit()
+    key_id, secret = key.split('.')
+    assert user.api_key_id == key_id
+    # Vom Geheimnis wird nichts im Klartext gespeichert
+    assert secret[:8] not in (user.api_key_id + user.api_key_hash)
+    assert verify_api_key(key).username == 'alice'
+    assert verify_api_key(f'{key_id}.{"0" * len(secret)}') is None
+    assert verify_api_key(secret) is None
+
+
+def test_regenerating_invalidates_the_old_key(database):
+    user = add_user('bob')
+    old_key = generate_api_key()
+    set_api_key(user, old_key)
+    db.session.commit()
+    set_api_key(user, generate_api_key())
+    db.session.commit()
+    api_auth_cache.invalidate(user.id)
+    assert verify_api_key(old_key) is None
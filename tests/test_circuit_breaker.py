@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from app import CircuitBreaker, DockerUnavailable
+
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker('test', threshold=2, cooldown=60)
+    breaker.failure()
+    breaker.check()
+    assert not breaker.is_open
+    breaker.failure()
+    assert breaker.is_open
+    with pytest.raises(DockerUnavailable):
+        breaker.check()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker('test', threshold=2, cooldown=60)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert not breaker.is_open
+
+
+def test_lets_one_probe_through_after_the_cooldown():
+    breaker = CircuitBreaker('test', threshold=1, cooldown=0.05)
+    breaker.failure()
+    with pytest.raises(DockerUnavailable):
+        breaker.check()
+    time.sleep(0.06)
+    breaker.check()
+    # Nur ein Probe-Aufruf, weitere warten wieder den Cooldown ab
+    with pytest.raises(DockerUnavailable):
+        breaker.check()
+    breaker.success()
+    assert not breaker.is_open
+    breaker.check()
+
+
+def test_failed_probe_keeps_the_circuit_open():
+    breaker = CircuitBreaker('test', threshold=1, cooldown=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    breaker.check()
+    breaker.failure()
+    assert breaker.is_open
+    with pytest.raises(DockerUnavailable):
+        breaker.check()
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import ControlCoordinator, SingleFlight
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(('inspect', 'web'), slow))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ['result'] * 5
+
+
+def test_single_flight_passes_errors_and_forgets_the_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError('daemon error')
+
+    with pytest.raises(RuntimeError):
+        flight.do(('inspect', 'web'), fail)
+    assert flight.do(('inspect', 'web'), lambda: 'again') == 'again'
+
+
+def run_storm(requests):
+    # requests: Liste von (Aktion, Verzögerung in Sekunden vor dem Absenden)
+    coordinator = ControlCoordinator()
+    executed = []
+
+    async def storm():
+        async def control(action, delay):
+            await asyncio.sleep(delay)
+
+            async def execute():
+                executed.append(action)
+                await asyncio.sleep(0.05)
+                return 'done', {'action': action}
+            outcome, _ = await coordinator.run((None, 'web'), action, execute)
+            return outcome
+        return await asyncio.gather(*(control(action, delay) for action, delay in requests))
+    return asyncio.run(storm()), executed, coordinator
+
+
+def test_coordinator_merges_identical_actions():
+    outcomes, executed, coordinator = run_storm([('start', 0), ('start', 0.01), ('start', 0.02)])
+    assert executed == ['start']
+    assert outcomes == ['done', 'merged', 'merged']
+    assert coordinator._latest == {}
+
+
+def test_coordinator_runs_opposite_actions_in_order_and_supersedes_waiting_ones():
+    outcomes, executed, _ = run_storm([('stop', 0), ('start', 0.01), ('stop', 0.02), ('start', 0.03)])
+    # Während "stop" läuft, verdrängt jede neue Aktion die vorher wartende; nur die letzte läuft
+    assert executed == ['stop', 'start']
+    assert outcomes == ['done', 'superseded', 'superseded', 'done']
+
+
+def test_coordinator_runs_next_action_after_a_failure():
+    coordinator = ControlCoordinator()
+
+    async def scenario():
+        async def fail():
+            await asyncio.sleep(0.02)
+            raise RuntimeError('start failed')
+
+        async def stop():
+            return 'done', None
+        first = asyncio.ensure_future(coordinator.run((None, 'web'), 'start', fail))
+        await asyncio.sleep(0.01)
+        second = await coordinator.run((None, 'web'), 'stop', stop)
+        with pytest.raises(RuntimeError):
+            await first
+        return second
+    assert asyncio.run(scenario()) == ('done', None)
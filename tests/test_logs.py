@@ -0,0 +1,73 @@
+import re
+
+from app import LOGS_MAX_LINE, LogLineSplitter, LogStreamLimiter
+
+
+def test_splitter_joins_lines_across_blocks_per_stream():
+    splitter = LogLineSplitter()
+    assert splitter.feed('stdout', b'first\nsec') == [('stdout', 'first')]
+    assert splitter.feed('stderr', b'error\r\n') == [('stderr', 'error')]
+    assert splitter.feed('stdout', b'ond\n') == [('stdout', 'second')]
+    assert splitter.flush() == []
+
+
+def test_splitter_flushes_the_unterminated_rest():
+    splitter = LogLineSplitter()
+    assert splitter.feed('stdout', b'no newline') == []
+    assert splitter.flush() == [('stdout', 'no newline')]
+    assert splitter.flush() == []
+
+
+def test_splitter_filters_by_pattern():
+    splitter = LogLineSplitter(re.compile('err'))
+    assert splitter.feed('stdout', b'ok\nerror 1\nfine\nerr 2\n') == [('stdout', 'error 1'), ('stdout', 'err 2')]
+
+
+def test_splitter_cuts_overlong_lines():
+    splitter = LogLineSplitter()
+    lines = splitter.feed('stdout', b'x' * (LOGS_MAX_LINE * 2 + 5))
+    assert [len(line) for _, line in lines] == [LOGS_MAX_LINE, LOGS_MAX_LINE]
+    assert splitter.flush() == [('stdout', 'xxxxx')]
+
+
+def test_splitter_replaces_invalid_utf8():
+    splitter = LogLineSplitter()
+    assert splitter.feed('stdout', b'caf\xc3\xa9 \xff\n') == [('stdout', 'café �')]
+
+
+def test_limiter_slots_per_user_are_shared_between_processes(tmp_path):
+    # Zwei Limiter mit demselben Lock-Verzeichnis verhalten sich wie zwei Worker-Prozesse
+    first = LogStreamLimiter(per_user=2, total=8, lock_dir=str(tmp_path))
+    second = LogStreamLimiter(per_user=2, total=8, lock_dir=str(tmp_path))
+    fd1, _ = first.acquire(1)
+    fd2, _ = second.acquire(1)
+    assert fd1 is not None and fd2 is not None
+    assert second.acquire(1) == (None, 'user')
+    fd3, _ = second.acquire(2)
+    assert fd3 is not None
+    first.release(fd1)
+    fd4, limit = second.acquire(1)
+    assert fd4 is not None and limit is None
+    for fd in (fd2, fd3, fd4):
+        second.release(fd)
+
+
+def test_limiter_caps_streams_per_process(tmp_path):
+    limiter = LogStreamLimiter(per_user=5, total=2, lock_dir=str(tmp_path))
+    fds = [limiter.acquire(user_id)[0] for user_id in (1, 2)]
+    assert limiter.acquire(3) == (None, 'process')
+    limiter.release(fds.pop())
+    fds.append(limiter.acquire(3)[0])
+    assert None not in fds
+    for fd in fds:
+        limiter.release(fd)
+
+
+def test_limiter_user_rejection_frees_the_process_slot(tmp_path):
+    limiter = LogStreamLimiter(per_user=1, total=2, lock_dir=str(tmp_path))
+    fd, _ = limiter.acquire(1)
+    assert limiter.acquire(1) == (None, 'user')
+    other, limit = limiter.acquire(2)
+    assert other is not None and limit is None
+    limiter.release(fd)
+    limiter.release(other)
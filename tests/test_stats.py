@@ -0,0 +1,44 @@
+import math
+
+from app import NAN, STATS_WIDTH, StatsRing
+
+
+def row(t, cpu=NAN, memory=NAN):
+    return [t, cpu, memory] + [NAN] * (STATS_WIDTH - 3)
+
+
+def test_ring_keeps_the_newest_rows_oldest_first():
+    ring = StatsRing(3)
+    for t in range(5):
+        ring.append(row(t, cpu=t * 10))
+    assert [r[0] for r in ring.rows()] == [2, 3, 4]
+    assert [r[0] for r in ring.rows(since=3)] == [3, 4]
+    assert ring.last()[1] == 40
+
+
+def test_empty_ring():
+    ring = StatsRing(3)
+    assert ring.last() is None
+    assert ring.rows() == []
+
+
+def test_rollup_stores_the_mean_when_the_interval_changes():
+    ring = StatsRing(10, step=60)
+    ring.add(row(0, cpu=10, memory=100))
+    ring.add(row(30, cpu=20, memory=300))
+    assert ring.rows() == []
+    ring.add(row(61, cpu=50, memory=500))
+    assert len(ring.rows()) == 1
+    first = ring.last()
+    assert (first[0], first[1], first[2]) == (0, 15, 200)
+
+
+def test_rollup_skips_unknown_values():
+    ring = StatsRing(10, step=60)
+    ring.add(row(0, cpu=10))
+    ring.add(row(10, cpu=30, memory=200))
+    ring.add(row(20))
+    ring.add(row(125, cpu=1))
+    (first,) = ring.rows()
+    assert (first[0], first[1], first[2]) == (0, 20, 200)
+    assert math.isnan(first[3])